@@ -0,0 +1,66 @@
+"""
+Fixtures compartidas de pytest para el Homologador de Aplicaciones.
+Toda la sesión usa una única base de datos temporal y un único DatabaseManager.
+"""
+
+import os
+import sys
+
+import pytest
+
+# Permitir importar core/ y data/ al ejecutar pytest desde cualquier carpeta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def db(tmp_path_factory):
+    """DatabaseManager de la sesión sobre una BD temporal con datos iniciales."""
+    import core.portable as portable
+    import core.settings as settings_module
+    import core.storage as storage
+    from core.audit import get_audit_writer
+    from data.seed import create_seed_data
+    
+    data_dir = tmp_path_factory.mktemp("homologador")
+    
+    with pytest.MonkeyPatch.context() as mp:
+        # Redirigir las rutas portables a la carpeta temporal
+        mp.setattr(portable, "get_database_path", lambda: str(data_dir / "homologador.db"))
+        mp.setattr(portable, "get_backups_path", lambda: str(data_dir / "backups"))
+        mp.setattr(settings_module, "_settings", None)
+        mp.setattr(storage, "_db_manager", None)
+        
+        manager = storage.get_database_manager()
+        create_seed_data()
+        
+        yield manager
+        
+        get_audit_writer().flush()
+        manager.close()
+
+
+@pytest.fixture(scope="session")
+def settings(db):
+    """Configuración activa de la sesión."""
+    return db.settings
+
+
+@pytest.fixture(scope="session")
+def auth(db):
+    """Servicio de autenticación de la sesión."""
+    from data.seed import get_auth_service
+    return get_auth_service()
+
+
+@pytest.fixture(scope="session")
+def homologation_repo(db):
+    """Repositorio de homologaciones sobre la BD de la sesión."""
+    from core.storage import HomologationRepository
+    return HomologationRepository(db)
+
+
+@pytest.fixture(scope="session")
+def audit_repo(db):
+    """Repositorio de auditoría sobre la BD de la sesión."""
+    from core.storage import AuditRepository
+    return AuditRepository(db)
@@ -3,8 +3,15 @@ Módulo de auditoría avanzada para el Homologador de Aplicaciones.
 Funciones adicionales para logging y reporting de auditoría.
 """
 
+import atexit
+import copy
 import logging
 import json
+import queue
+import threading
+import time
+import functools
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
@@ -13,6 +20,68 @@ from core.storage import get_audit_repository, get_user_repository
 
 logger = logging.getLogger(__name__)
 
+# Máscaras de bits para clasificar actividad fuera de horario:
+# el bit i está activo si la hora i (o el día de la semana i) es anómalo.
+NIGHT_MASK = 0b11000000_00000000_01111111  # 22:00 - 06:59
+WEEKEND_MASK = 0b1100000  # Sábado (5) y domingo (6)
+
+# Umbrales de logins fallidos para marcar IPs / usuarios como sospechosos
+SUSPICIOUS_IP_THRESHOLD = 3
+SUSPICIOUS_USER_THRESHOLD = 5
+
+# Segundos que un reporte generado se mantiene en cache
+REPORT_CACHE_TTL = 60
+
+# Cola de escritura de auditoría: capacidad, tamaño máximo de lote y espera
+# máxima antes de volcar un lote incompleto
+AUDIT_QUEUE_MAXSIZE = 10_000
+AUDIT_BATCH_SIZE = 200
+AUDIT_FLUSH_INTERVAL_S = 0.2
+
+# Reintentos de un lote fallido (p. ej. BD bloqueada) y espera base entre ellos
+AUDIT_WRITE_RETRIES = 3
+AUDIT_RETRY_DELAY_S = 0.5
+
+
+def _ttl_cache(ttl: float = REPORT_CACHE_TTL):
+    """
+    Cachea en memoria el resultado de un método de reporte durante `ttl` segundos.
+    
+    La clave incluye los argumentos y la versión de datos de la BD, de modo que
+    cualquier escritura realizada por la aplicación invalida los reportes.
+    Cada llamada recibe una copia profunda: modificar el reporte no altera el cache.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            now = time.monotonic()
+            key = (func.__name__, args, tuple(sorted(kwargs.items())),
+                   self.audit_repo.db.data_version)
+            
+            cached = self._report_cache.get(key)
+            if cached and cached[0] > now:
+                return copy.deepcopy(cached[1])
+            
+            result = func(self, *args, **kwargs)
+            
+            # Descartar entradas expiradas antes de guardar la nueva
+            for old_key in [k for k, (expires, _) in self._report_cache.items() if expires <= now]:
+                del self._report_cache[old_key]
+            self._report_cache[key] = (now + ttl, result)
+            return copy.deepcopy(result)
+        return wrapper
+    return decorator
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Convierte un timestamp ISO de la BD en datetime, o None si no es válido."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
 
 @dataclass
 class AuditEvent:
@@ -111,20 +180,20 @@ class AuditReporter:
     def __init__(self):
         self.audit_repo = get_audit_repository()
         self.user_repo = get_user_repository()
+        self._report_cache = {}
     
+    @_ttl_cache()
     def get_login_report(self, days: int = 30) -> Dict[str, Any]:
         """Genera reporte de logins en los últimos N días."""
         date_from = (datetime.now() - timedelta(days=days)).isoformat()
         
-        filters = {
-            'action': 'LOGIN_SUCCESS',
-            'date_from': date_from
-        }
-        
-        successful_logins = self.audit_repo.get_audit_trail(filters)
-        
-        filters['action'] = 'LOGIN_FAILED'
-        failed_logins = self.audit_repo.get_audit_trail(filters)
+        # Una sola consulta para ambos tipos de login
+        logins = self._split_by_action(
+            self.audit_repo.get_actions_in_since(('LOGIN_SUCCESS', 'LOGIN_FAILED'), date_from),
+            'LOGIN_SUCCESS', 'LOGIN_FAILED'
+        )
+        successful_logins = logins['LOGIN_SUCCESS']
+        failed_logins = logins['LOGIN_FAILED']
         
         # Estadísticas por usuario
         user_stats = {}
@@ -158,16 +227,12 @@ class AuditReporter:
             'generated_at': datetime.now().isoformat()
         }
     
+    @_ttl_cache()
     def get_user_activity_report(self, user_id: int, days: int = 30) -> Dict[str, Any]:
         """Genera reporte de actividad de un usuario específico."""
         date_from = (datetime.now() - timedelta(days=days)).isoformat()
         
-        filters = {
-            'user_id': user_id,
-            'date_from': date_from
-        }
-        
-        activities = self.audit_repo.get_audit_trail(filters)
+        activities = self.audit_repo.get_user_activity_since(user_id, date_from)
         
         # Categorizar actividades
         activity_counts = {}
@@ -182,8 +247,8 @@ class AuditReporter:
                 recent_activities.append({
                     'action': action,
                     'timestamp': activity['timestamp'],
-                    'table_name': activity.get('table_name'),
-                    'record_id': activity.get('record_id')
+                    'table_name': activity['table_name'],
+                    'record_id': activity['record_id']
                 })
         
         user = self.user_repo.get_by_id(user_id)
@@ -198,17 +263,13 @@ class AuditReporter:
             'generated_at': datetime.now().isoformat()
         }
     
+    @_ttl_cache()
     def get_data_changes_report(self, table_name: str = 'homologations', 
                                days: int = 30) -> Dict[str, Any]:
         """Genera reporte de cambios en los datos."""
         date_from = (datetime.now() - timedelta(days=days)).isoformat()
         
-        filters = {
-            'table_name': table_name,
-            'date_from': date_from
-        }
-        
-        changes = self.audit_repo.get_audit_trail(filters)
+        changes = self.audit_repo.get_table_changes_since(table_name, date_from)
         
         # Estadísticas por tipo de acción
         action_stats = {}
@@ -236,65 +297,53 @@ class AuditReporter:
             'generated_at': datetime.now().isoformat()
         }
     
+    def _split_by_action(self, rows: List[Dict[str, Any]], *actions: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Separa los resultados de una consulta combinada por tipo de acción."""
+        grouped = {action: [] for action in actions}
+        for row in rows:
+            grouped[row['action']].append(row)
+        return grouped
+    
     def _group_changes_by_day(self, changes: List[Dict[str, Any]]) -> Dict[str, int]:
         """Agrupa cambios por día."""
         daily_counts = {}
         
         for change in changes:
-            try:
-                timestamp = change['timestamp']
-                date_key = timestamp.split('T')[0]  # Solo la fecha
-                daily_counts[date_key] = daily_counts.get(date_key, 0) + 1
-            except:
+            timestamp = change['timestamp']
+            if not timestamp:
                 continue
+            
+            date_key = timestamp[:10]  # Solo la fecha (YYYY-MM-DD)
+            daily_counts[date_key] = daily_counts.get(date_key, 0) + 1
         
         return daily_counts
     
+    @_ttl_cache()
     def get_security_report(self, days: int = 7) -> Dict[str, Any]:
         """Genera reporte de seguridad con eventos sospechosos."""
         date_from = (datetime.now() - timedelta(days=days)).isoformat()
         
-        # Buscar intentos de login fallidos
-        failed_login_filters = {
-            'action': 'LOGIN_FAILED',
-            'date_from': date_from
-        }
-        
-        failed_logins = self.audit_repo.get_audit_trail(failed_login_filters)
+        # Totales de logins fallidos y accesos denegados
+        totals = self.audit_repo.count_security_events_since(date_from)
         
-        # Buscar accesos denegados
-        denied_filters = {
-            'action': 'PERMISSION_DENIED',
-            'date_from': date_from
+        # IPs con múltiples intentos fallidos (umbral aplicado en SQL)
+        suspicious_ips = {
+            row['ip_address']: row['attempts']
+            for row in self.audit_repo.get_failed_logins_by_ip(date_from, SUSPICIOUS_IP_THRESHOLD)
         }
         
-        denied_accesses = self.audit_repo.get_audit_trail(denied_filters)
-        
-        # Análisis de patrones sospechosos
-        ip_failed_attempts = {}
-        user_failed_attempts = {}
-        
-        for login in failed_logins:
-            ip = login.get('ip_address', 'Unknown')
-            user = login.get('username', 'Unknown')
-            
-            ip_failed_attempts[ip] = ip_failed_attempts.get(ip, 0) + 1
-            user_failed_attempts[user] = user_failed_attempts.get(user, 0) + 1
-        
-        # IPs con múltiples intentos fallidos
-        suspicious_ips = {ip: count for ip, count in ip_failed_attempts.items() if count >= 3}
-        
-        # Usuarios con múltiples fallos
-        suspicious_users = {user: count for user, count in user_failed_attempts.items() if count >= 5}
+        # Usuarios con múltiples fallos (umbral aplicado en SQL)
+        suspicious_users = {
+            row['username']: row['attempts']
+            for row in self.audit_repo.get_failed_logins_by_user(date_from, SUSPICIOUS_USER_THRESHOLD)
+        }
         
         return {
             'period_days': days,
-            'total_failed_logins': len(failed_logins),
-            'total_denied_accesses': len(denied_accesses),
+            'total_failed_logins': totals.get('LOGIN_FAILED', 0),
+            'total_denied_accesses': totals.get('PERMISSION_DENIED', 0),
             'suspicious_ips': suspicious_ips,
             'suspicious_users': suspicious_users,
-            'ip_attempt_summary': ip_failed_attempts,
-            'user_attempt_summary': user_failed_attempts,
             'generated_at': datetime.now().isoformat()
         }
 
@@ -304,45 +353,39 @@ class AuditAnalyzer:
     
     def __init__(self):
         self.audit_repo = get_audit_repository()
+        self._report_cache = {}
     
     def detect_unusual_activity(self, user_id: int, days: int = 7) -> List[Dict[str, Any]]:
         """Detecta actividad inusual para un usuario."""
         date_from = (datetime.now() - timedelta(days=days)).isoformat()
         
-        filters = {
-            'user_id': user_id,
-            'date_from': date_from
-        }
-        
-        activities = self.audit_repo.get_audit_trail(filters)
+        activities = self.audit_repo.get_user_activity_since(user_id, date_from)
         
         anomalies = []
         
         # Detectar actividad fuera del horario normal (ejemplo: noches/fines de semana)
         for activity in activities:
-            try:
-                timestamp = datetime.fromisoformat(activity['timestamp'].replace('Z', '+00:00'))
-                
-                # Actividad nocturna (22:00 - 06:00)
-                if timestamp.hour >= 22 or timestamp.hour <= 6:
-                    anomalies.append({
-                        'type': 'NIGHT_ACTIVITY',
-                        'timestamp': activity['timestamp'],
-                        'action': activity['action'],
-                        'severity': 'LOW'
-                    })
-                
-                # Actividad en fin de semana
-                if timestamp.weekday() >= 5:  # Sábado y domingo
-                    anomalies.append({
-                        'type': 'WEEKEND_ACTIVITY',
-                        'timestamp': activity['timestamp'],
-                        'action': activity['action'],
-                        'severity': 'MEDIUM'
-                    })
-                
-            except:
+            timestamp = _parse_timestamp(activity['timestamp'])
+            if timestamp is None:
                 continue
+            
+            # Actividad nocturna (22:00 - 06:00)
+            if (NIGHT_MASK >> timestamp.hour) & 1:
+                anomalies.append({
+                    'type': 'NIGHT_ACTIVITY',
+                    'timestamp': activity['timestamp'],
+                    'action': activity['action'],
+                    'severity': 'LOW'
+                })
+            
+            # Actividad en fin de semana
+            if (WEEKEND_MASK >> timestamp.weekday()) & 1:
+                anomalies.append({
+                    'type': 'WEEKEND_ACTIVITY',
+                    'timestamp': activity['timestamp'],
+                    'action': activity['action'],
+                    'severity': 'MEDIUM'
+                })
         
         # Detectar acciones múltiples en poco tiempo (posible script)
         action_times = {}
@@ -363,15 +406,12 @@ class AuditAnalyzer:
         
         return anomalies
     
+    @_ttl_cache()
     def get_usage_patterns(self, days: int = 30) -> Dict[str, Any]:
         """Analiza patrones de uso del sistema."""
         date_from = (datetime.now() - timedelta(days=days)).isoformat()
         
-        filters = {
-            'date_from': date_from
-        }
-        
-        activities = self.audit_repo.get_audit_trail(filters)
+        activities = self.audit_repo.get_activity_since(date_from)
         
         # Análisis por hora del día
         hourly_activity = [0] * 24
@@ -379,23 +419,21 @@ class AuditAnalyzer:
         user_activity = {}
         
         for activity in activities:
-            try:
-                timestamp = datetime.fromisoformat(activity['timestamp'].replace('Z', '+00:00'))
-                
-                # Por hora
-                hourly_activity[timestamp.hour] += 1
-                
-                # Por día
-                date_key = timestamp.strftime('%Y-%m-%d')
-                daily_activity[date_key] = daily_activity.get(date_key, 0) + 1
-                
-                # Por usuario
-                user_id = activity['user_id']
-                if user_id:
-                    user_activity[user_id] = user_activity.get(user_id, 0) + 1
-                
-            except:
+            timestamp = _parse_timestamp(activity['timestamp'])
+            if timestamp is None:
                 continue
+            
+            # Por hora
+            hourly_activity[timestamp.hour] += 1
+            
+            # Por día
+            date_key = activity['timestamp'][:10]
+            daily_activity[date_key] = daily_activity.get(date_key, 0) + 1
+            
+            # Por usuario
+            user_id = activity['user_id']
+            if user_id:
+                user_activity[user_id] = user_activity.get(user_id, 0) + 1
         
         # Encontrar hora pico
         peak_hour = hourly_activity.index(max(hourly_activity))
@@ -415,12 +453,135 @@ class AuditAnalyzer:
         }
 
 
+class AuditWriter:
+    """
+    Escritor de auditoría en segundo plano.
+    
+    Los eventos se encolan en memoria y un hilo daemon los inserta por lotes
+    con executemany, así quien registra (p. ej. un login) no espera el commit.
+    Al salir del proceso se vuelca lo pendiente.
+    """
+    
+    def __init__(self):
+        self.audit_repo = get_audit_repository()
+        self._queue = queue.Queue(maxsize=AUDIT_QUEUE_MAXSIZE)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Eventos encolados y aún no escritos por usuario (user_id -> cantidad)
+        self._pending_users = Counter()
+        self._pending_lock = threading.Lock()
+        atexit.register(self.flush)
+    
+    def log_action(self, user_id: int, action: str, table_name: str = None,
+                   record_id: int = None, old_values: Dict = None,
+                   new_values: Dict = None, ip_address: str = None):
+        """Encola una acción con los mismos argumentos que AuditRepository.log_action."""
+        self._ensure_thread()
+        entry = (user_id, action, table_name, record_id, old_values, new_values, ip_address)
+        with self._pending_lock:
+            self._pending_users[user_id] += 1
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            # Cola llena: esperar a que el hilo escritor libere espacio
+            self._queue.put(entry)
+    
+    def flush(self):
+        """Espera a que se escriban todos los eventos encolados."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+        else:
+            # Sin hilo escritor: vaciar la cola por lotes en este hilo
+            while batch := self._drain(block=False):
+                self._write_batch(batch)
+    
+    def has_pending(self, user_id: Optional[int]) -> bool:
+        """Retorna si quedan eventos del usuario encolados sin escribir."""
+        with self._pending_lock:
+            return self._pending_users[user_id] > 0
+    
+    def _ensure_thread(self):
+        """Arranca el hilo escritor en el primer uso."""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="audit-writer", daemon=True
+                    )
+                    self._thread.start()
+    
+    def _run(self):
+        """Bucle del hilo escritor: espera un evento y vuelca el lote acumulado."""
+        while True:
+            self._write_batch(self._drain(block=True))
+    
+    def _drain(self, block: bool) -> List[tuple]:
+        """Toma hasta AUDIT_BATCH_SIZE eventos, esperando como máximo el intervalo de volcado."""
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get())
+            deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL_S
+            while len(batch) < AUDIT_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if not block or remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+        except queue.Empty:
+            pass
+        return batch
+    
+    def _write_batch(self, batch: List[tuple]):
+        """
+        Inserta un lote en una sola transacción.
+        
+        Si la BD falla se reintenta AUDIT_WRITE_RETRIES veces; si sigue
+        fallando, cada evento se vuelca completo al log de la aplicación para
+        poder recuperarlo, en lugar de descartarlo.
+        """
+        if not batch:
+            return
+        try:
+            for attempt in range(1, AUDIT_WRITE_RETRIES + 1):
+                try:
+                    self.audit_repo.log_actions_bulk(batch)
+                    return
+                except Exception as e:
+                    logger.warning("Error escribiendo %d eventos de auditoría (intento %d/%d): %s",
+                                   len(batch), attempt, AUDIT_WRITE_RETRIES, e)
+                    if attempt < AUDIT_WRITE_RETRIES:
+                        time.sleep(AUDIT_RETRY_DELAY_S * attempt)
+            
+            for entry in batch:
+                logger.error("Evento de auditoría no persistido: %s",
+                             json.dumps(entry, ensure_ascii=False, default=str))
+        finally:
+            with self._pending_lock:
+                for entry in batch:
+                    user_id = entry[0]
+                    self._pending_users[user_id] -= 1
+                    if self._pending_users[user_id] <= 0:
+                        del self._pending_users[user_id]
+            for _ in batch:
+                self._queue.task_done()
+
+
 # Instancias globales
+_audit_writer = None
 _audit_logger = None
 _audit_reporter = None
 _audit_analyzer = None
 
 
+def get_audit_writer() -> AuditWriter:
+    """Retorna la instancia global del escritor de auditoría en segundo plano."""
+    global _audit_writer
+    if _audit_writer is None:
+        _audit_writer = AuditWriter()
+    return _audit_writer
+
+
 def get_audit_logger() -> AuditLogger:
     """Retorna la instancia global del logger de auditoría."""
     global _audit_logger
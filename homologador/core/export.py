@@ -6,21 +6,112 @@ Funciones para exportar datos a CSV, Excel y otros formatos.
 import os
 import logging
 import csv
+import itertools
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Callable
 from pathlib import Path
 
 try:
+    import numpy as np
     import pandas as pd
     PANDAS_AVAILABLE = True
 except ImportError:
     PANDAS_AVAILABLE = False
 
+# orjson decodifica JSON varias veces más rápido que la librería estándar
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+    _json_loads = json.loads
+
+# xlsxwriter escribe en streaming y es bastante más rápido que openpyxl;
+# openpyxl queda como alternativa si no está instalado.
+try:
+    import xlsxwriter  # noqa: F401
+    EXCEL_ENGINE = 'xlsxwriter'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
 from core.storage import get_homologation_repository, get_audit_repository
 from core.audit import get_audit_logger
 
 logger = logging.getLogger(__name__)
 
+# Filas por bloque al formatear exportaciones CSV con pandas
+CSV_CHUNK_SIZE = 5000
+
+# Buffer de escritura de los archivos CSV (1 MB) para reducir syscalls
+CSV_BUFFER_SIZE = 1 << 20
+
+# Cada cuántas filas se notifica el progreso de una exportación
+EXPORT_PROGRESS_INTERVAL = 1000
+
+# Columnas exportadas, en el orden en que se escriben
+HOMOLOGATION_FIELDS = (
+    'id', 'real_name', 'logical_name', 'kb_url',
+    'homologation_date', 'has_previous_versions', 'repository_location',
+    'details', 'created_by_username', 'created_by_full_name',
+    'created_at', 'updated_at'
+)
+
+AUDIT_FIELDS = (
+    'id', 'action', 'table_name', 'record_id',
+    'username', 'full_name', 'timestamp',
+    'old_values', 'new_values', 'ip_address'
+)
+
+# Encabezados en español, en el mismo orden que las columnas
+SPANISH_HEADERS_HOMOLOG = (
+    'ID', 'Nombre Real', 'Nombre Lógico', 'URL Documentación',
+    'Fecha Homologación', 'Versiones Previas', 'Repositorio',
+    'Detalles', 'Usuario Creador', 'Nombre Completo Creador',
+    'Fecha Creación', 'Última Actualización'
+)
+
+SPANISH_HEADERS_AUDIT = (
+    'ID', 'Acción', 'Tabla', 'ID Registro',
+    'Usuario', 'Nombre Completo', 'Fecha y Hora',
+    'Valores Anteriores', 'Valores Nuevos', 'Dirección IP'
+)
+
+HOMOLOGATION_DATE_FIELDS = frozenset(('homologation_date', 'created_at', 'updated_at'))
+AUDIT_JSON_FIELDS = frozenset(('old_values', 'new_values'))
+
+# Filtros de homologaciones que se trasladan a la consulta
+_FILTER_KEYS = (
+    'search_term', 'real_name', 'logical_name',
+    'date_from', 'date_to', 'repository_location'
+)
+
+# Posiciones precalculadas de los campos que requieren formato
+_PREVIOUS_VERSIONS_IDX = HOMOLOGATION_FIELDS.index('has_previous_versions')
+_DATE_FIELD_IDXS = tuple(HOMOLOGATION_FIELDS.index(field) for field in HOMOLOGATION_DATE_FIELDS)
+
+_kv_fmt = "{0[0]}: {0[1]}".format
+_FROMISO = datetime.fromisoformat
+_OUT_FMT = '%d/%m/%Y %H:%M:%S'
+
+
+def with_progress(rows: Iterator[Any], progress_cb: Callable[[int], None]) -> Iterator[Any]:
+    """Reenvía las filas notificando a progress_cb cada EXPORT_PROGRESS_INTERVAL."""
+    for count, row in enumerate(rows, 1):
+        yield row
+        if count % EXPORT_PROGRESS_INTERVAL == 0:
+            progress_cb(count)
+
+
+def _format_iso_datetime(value: Any) -> Any:
+    """Formatea un timestamp ISO como dd/mm/aaaa; si no es válido lo deja igual."""
+    text = value if isinstance(value, str) else str(value)
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    try:
+        return _FROMISO(text).strftime(_OUT_FMT)
+    except (ValueError, TypeError):
+        return value
+
 
 class ExportError(Exception):
     """Excepción personalizada para errores de exportación."""
@@ -36,68 +127,57 @@ class DataExporter:
         self.audit_logger = get_audit_logger()
     
     def export_homologations_to_csv(self, filename: str, filters: Dict[str, Any] = None, 
-                                   user_id: int = None) -> bool:
-        """Exporta homologaciones a CSV usando el módulo csv estándar."""
+                                   user_id: int = None,
+                                   progress_cb: Optional[Callable[[int], None]] = None) -> bool:
+        """
+        Exporta homologaciones a CSV usando el módulo csv estándar.
+        
+        Si se indica progress_cb, se invoca con el número de filas procesadas
+        cada EXPORT_PROGRESS_INTERVAL filas y al terminar.
+        """
         try:
-            # Obtener datos
-            if filters and filters.get('search_term'):
-                data = self.homolog_repo.search(filters['search_term'])
-            else:
-                filter_dict = self._prepare_filters(filters)
-                data = self.homolog_repo.get_all(filter_dict)
-            
-            # Convertir a lista de diccionarios
-            records = [dict(row) for row in data]
+            # Obtener datos como stream (sin cargar todo en memoria)
+            rows = self._iter_homologations(filters)
+            first_row = next(rows, None)
             
-            if not records:
+            if first_row is None:
                 raise ExportError("No hay datos para exportar")
             
             # Escribir CSV
-            with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                # Headers personalizados
-                fieldnames = [
-                    'id', 'real_name', 'logical_name', 'kb_url',
-                    'homologation_date', 'has_previous_versions', 'repository_location',
-                    'details', 'created_by_username', 'created_by_full_name',
-                    'created_at', 'updated_at'
-                ]
-                
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
-                
+            with open(filename, 'w', newline='', encoding='utf-8-sig',
+                      buffering=CSV_BUFFER_SIZE) as csvfile:
                 # Headers en español
-                spanish_headers = {
-                    'id': 'ID',
-                    'real_name': 'Nombre Real',
-                    'logical_name': 'Nombre Lógico',
-                    'kb_url': 'URL Documentación',
-                    'homologation_date': 'Fecha Homologación',
-                    'has_previous_versions': 'Versiones Previas',
-                    'repository_location': 'Repositorio',
-                    'details': 'Detalles',
-                    'created_by_username': 'Usuario Creador',
-                    'created_by_full_name': 'Nombre Completo Creador',
-                    'created_at': 'Fecha Creación',
-                    'updated_at': 'Última Actualización'
-                }
+                writer = csv.writer(csvfile)
+                writer.writerow(SPANISH_HEADERS_HOMOLOG)
                 
-                writer.writerow(spanish_headers)
+                all_rows = itertools.chain((first_row,), rows)
+                if progress_cb:
+                    all_rows = with_progress(all_rows, progress_cb)
                 
-                # Procesar datos
-                for record in records:
-                    # Formatear campos específicos
-                    processed_record = self._process_record_for_export(record)
-                    writer.writerow(processed_record)
+                if PANDAS_AVAILABLE:
+                    # Formateo vectorizado por bloques
+                    record_count = self._write_homologations_vectorized(writer, all_rows)
+                else:
+                    # Procesar datos; el contador queda en el número de filas escritas
+                    counter = itertools.count()
+                    writer.writerows(
+                        self._process_record_for_export(row) for row, _ in zip(all_rows, counter)
+                    )
+                    record_count = next(counter)
+            
+            if progress_cb:
+                progress_cb(record_count)
             
             # Log de exportación
             if user_id:
                 self.audit_logger.log_data_export(
                     user_id=user_id,
                     export_type="CSV_HOMOLOGATIONS",
-                    record_count=len(records),
+                    record_count=record_count,
                     filters=filters
                 )
             
-            logger.info(f"Exportación CSV exitosa: {filename} ({len(records)} registros)")
+            logger.info(f"Exportación CSV exitosa: {filename} ({record_count} registros)")
             return True
             
         except Exception as e:
@@ -112,35 +192,16 @@ class DataExporter:
         
         try:
             # Obtener datos
-            if filters and filters.get('search_term'):
-                data = self.homolog_repo.search(filters['search_term'])
-            else:
-                filter_dict = self._prepare_filters(filters)
-                data = self.homolog_repo.get_all(filter_dict)
-            
-            # Convertir a DataFrame
-            records = [dict(row) for row in data]
+            data = self.homolog_repo.get_all(self._prepare_filters(filters))
             
-            if not records:
+            if not data:
                 raise ExportError("No hay datos para exportar")
             
-            df = pd.DataFrame(records)
+            # Convertir a DataFrame directamente desde las filas sqlite3.Row
+            df = pd.DataFrame(data, columns=data[0].keys())
             
             # Reordenar y renombrar columnas
-            column_mapping = {
-                'id': 'ID',
-                'real_name': 'Nombre Real',
-                'logical_name': 'Nombre Lógico',
-                'kb_url': 'URL Documentación',
-                'homologation_date': 'Fecha Homologación',
-                'has_previous_versions': 'Versiones Previas',
-                'repository_location': 'Repositorio',
-                'details': 'Detalles',
-                'created_by_username': 'Usuario Creador',
-                'created_by_full_name': 'Nombre Completo Creador',
-                'created_at': 'Fecha Creación',
-                'updated_at': 'Última Actualización'
-            }
+            column_mapping = dict(zip(HOMOLOGATION_FIELDS, SPANISH_HEADERS_HOMOLOG))
             
             # Seleccionar y renombrar columnas existentes
             existing_columns = [col for col in column_mapping.keys() if col in df.columns]
@@ -151,43 +212,44 @@ class DataExporter:
             df_export = self._format_dataframe_for_export(df_export)
             
             # Exportar con formato
-            with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+            with pd.ExcelWriter(filename, engine=EXCEL_ENGINE) as writer:
                 df_export.to_excel(writer, sheet_name='Homologaciones', index=False)
                 
-                # Formatear hoja
                 workbook = writer.book
                 worksheet = writer.sheets['Homologaciones']
                 
-                # Ajustar ancho de columnas
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
+                # Ancho de columnas calculado sobre el DataFrame, sin recorrer celdas
+                column_widths = self._compute_column_widths(df_export)
+                
+                if EXCEL_ENGINE == 'xlsxwriter':
+                    header_format = workbook.add_format({'bold': True})
                     
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
+                    for i, col in enumerate(df_export.columns):
+                        # Formatear header
+                        worksheet.write(0, i, col, header_format)
+                        worksheet.set_column(i, i, column_widths[i])
+                else:
+                    from openpyxl.styles import Font
+                    from openpyxl.utils import get_column_letter
                     
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-                
-                # Formatear header
-                header_font = workbook.create_font(bold=True)
-                for cell in worksheet[1]:
-                    cell.font = header_font
+                    # Formatear header
+                    header_font = Font(bold=True)
+                    for cell in worksheet[1]:
+                        cell.font = header_font
+                    
+                    for i, width in enumerate(column_widths):
+                        worksheet.column_dimensions[get_column_letter(i + 1)].width = width
             
             # Log de exportación
             if user_id:
                 self.audit_logger.log_data_export(
                     user_id=user_id,
                     export_type="EXCEL_HOMOLOGATIONS",
-                    record_count=len(records),
+                    record_count=len(df_export),
                     filters=filters
                 )
             
-            logger.info(f"Exportación Excel exitosa: {filename} ({len(records)} registros)")
+            logger.info(f"Exportación Excel exitosa: {filename} ({len(df_export)} registros)")
             return True
             
         except Exception as e:
@@ -195,168 +257,169 @@ class DataExporter:
             raise ExportError(f"Error exportando a Excel: {e}")
     
     def export_audit_trail_to_csv(self, filename: str, filters: Dict[str, Any] = None,
-                                 user_id: int = None) -> bool:
-        """Exporta trail de auditoría a CSV."""
+                                 user_id: int = None,
+                                 progress_cb: Optional[Callable[[int], None]] = None) -> bool:
+        """Exporta trail de auditoría a CSV, notificando el progreso a progress_cb."""
         try:
-            # Obtener datos de auditoría
-            audit_data = self.audit_repo.get_audit_trail(filters)
-            records = [dict(row) for row in audit_data]
+            # Obtener datos de auditoría como stream
+            rows = self.audit_repo.get_audit_trail_iter(filters)
+            first_row = next(rows, None)
             
-            if not records:
+            if first_row is None:
                 raise ExportError("No hay datos de auditoría para exportar")
             
             # Escribir CSV
-            with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                fieldnames = [
-                    'id', 'action', 'table_name', 'record_id',
-                    'username', 'full_name', 'timestamp',
-                    'old_values', 'new_values', 'ip_address'
-                ]
-                
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
-                
+            with open(filename, 'w', newline='', encoding='utf-8-sig',
+                      buffering=CSV_BUFFER_SIZE) as csvfile:
                 # Headers en español
-                spanish_headers = {
-                    'id': 'ID',
-                    'action': 'Acción',
-                    'table_name': 'Tabla',
-                    'record_id': 'ID Registro',
-                    'username': 'Usuario',
-                    'full_name': 'Nombre Completo',
-                    'timestamp': 'Fecha y Hora',
-                    'old_values': 'Valores Anteriores',
-                    'new_values': 'Valores Nuevos',
-                    'ip_address': 'Dirección IP'
-                }
+                writer = csv.writer(csvfile)
+                writer.writerow(SPANISH_HEADERS_AUDIT)
                 
-                writer.writerow(spanish_headers)
+                all_rows = itertools.chain((first_row,), rows)
+                if progress_cb:
+                    all_rows = with_progress(all_rows, progress_cb)
                 
-                # Procesar datos
-                for record in records:
-                    processed_record = self._process_audit_record_for_export(record)
-                    writer.writerow(processed_record)
+                # Procesar datos; el contador queda en el número de filas escritas
+                counter = itertools.count()
+                writer.writerows(
+                    self._process_audit_record_for_export(row)
+                    for row, _ in zip(all_rows, counter)
+                )
+                record_count = next(counter)
+            
+            if progress_cb:
+                progress_cb(record_count)
             
             # Log de exportación
             if user_id:
                 self.audit_logger.log_data_export(
                     user_id=user_id,
                     export_type="CSV_AUDIT_TRAIL",
-                    record_count=len(records),
+                    record_count=record_count,
                     filters=filters
                 )
             
-            logger.info(f"Exportación auditoría CSV exitosa: {filename} ({len(records)} registros)")
+            logger.info(f"Exportación auditoría CSV exitosa: {filename} ({record_count} registros)")
             return True
             
         except Exception as e:
             logger.error(f"Error exportando auditoría a CSV: {e}")
             raise ExportError(f"Error exportando auditoría a CSV: {e}")
     
+    def _iter_homologations(self, filters: Optional[Dict[str, Any]]) -> Iterator[Any]:
+        """Itera las homologaciones a exportar según los filtros."""
+        return self.homolog_repo.get_all_iter(self._prepare_filters(filters))
+    
     def _prepare_filters(self, filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
-        """Prepara filtros para consulta."""
-        if not filters:
-            return {}
-        
-        filter_dict = {}
-        
-        if filters.get('real_name'):
-            filter_dict['real_name'] = filters['real_name']
-        
-        if filters.get('logical_name'):
-            filter_dict['logical_name'] = filters['logical_name']
-        
-        if filters.get('date_from'):
-            filter_dict['date_from'] = filters['date_from']
+        """Prepara filtros para consulta, conservando solo las claves soportadas con valor."""
+        filters = filters or {}
+        return {key: value for key in _FILTER_KEYS if (value := filters.get(key))}
+    
+    def _write_homologations_vectorized(self, writer, rows: Iterator[Any]) -> int:
+        """
+        Escribe homologaciones en CSV formateándolas con pandas en bloques.
         
-        if filters.get('date_to'):
-            filter_dict['date_to'] = filters['date_to']
+        Produce la misma salida que _process_record_for_export, pero procesa
+        CSV_CHUNK_SIZE filas por vez para no cargar toda la tabla en memoria.
+        """
+        record_count = 0
         
-        if filters.get('repository_location'):
-            filter_dict['repository_location'] = filters['repository_location']
+        while True:
+            chunk = list(itertools.islice(rows, CSV_CHUNK_SIZE))
+            if not chunk:
+                break
+            
+            df = pd.DataFrame([tuple(row) for row in chunk], columns=chunk[0].keys(), dtype=object)
+            df = df.reindex(columns=HOMOLOGATION_FIELDS)
+            
+            # Formatear booleanos
+            df['has_previous_versions'] = (
+                df['has_previous_versions'].fillna(0).astype(bool).map({True: 'Sí', False: 'No'})
+            )
+            
+            # Formatear fechas: solo se reinterpretan los valores ISO con 'T'
+            for date_field in HOMOLOGATION_DATE_FIELDS:
+                column = df[date_field]
+                iso_mask = column.notna() & column.astype(str).str.contains('T', regex=False)
+                if iso_mask.any():
+                    df.loc[iso_mask, date_field] = column[iso_mask].map(_format_iso_datetime)
+            
+            # Limpiar campos None
+            df = df.where(df.notna(), '')
+            
+            writer.writerows(df.itertuples(index=False, name=None))
+            record_count += len(chunk)
         
-        return filter_dict
+        return record_count
     
-    def _process_record_for_export(self, record: Dict[str, Any]) -> Dict[str, Any]:
-        """Procesa un registro para exportación."""
-        processed = record.copy()
+    def _process_record_for_export(self, record) -> tuple:
+        """Procesa un registro para exportación y lo retorna en el orden de HOMOLOGATION_FIELDS."""
+        processed = [record[field] for field in HOMOLOGATION_FIELDS]
         
         # Formatear booleanos
-        if 'has_previous_versions' in processed:
-            processed['has_previous_versions'] = 'Sí' if processed['has_previous_versions'] else 'No'
+        processed[_PREVIOUS_VERSIONS_IDX] = 'Sí' if processed[_PREVIOUS_VERSIONS_IDX] else 'No'
         
         # Formatear fechas
-        for date_field in ['homologation_date', 'created_at', 'updated_at']:
-            if date_field in processed and processed[date_field]:
-                try:
-                    if 'T' in str(processed[date_field]):
-                        dt = datetime.fromisoformat(str(processed[date_field]).replace('Z', '+00:00'))
-                        processed[date_field] = dt.strftime('%d/%m/%Y %H:%M:%S')
-                    else:
-                        processed[date_field] = str(processed[date_field])
-                except:
-                    pass  # Mantener valor original si no se puede formatear
+        for idx in _DATE_FIELD_IDXS:
+            value = processed[idx]
+            if value:
+                processed[idx] = _format_iso_datetime(value) if 'T' in str(value) else str(value)
         
         # Limpiar campos None
-        for key, value in processed.items():
-            if value is None:
-                processed[key] = ''
-        
-        return processed
+        return tuple('' if value is None else value for value in processed)
     
-    def _process_audit_record_for_export(self, record: Dict[str, Any]) -> Dict[str, Any]:
-        """Procesa un registro de auditoría para exportación."""
-        processed = record.copy()
+    def _process_audit_record_for_export(self, record) -> tuple:
+        """Procesa un registro de auditoría y lo retorna en el orden de AUDIT_FIELDS."""
+        processed = []
         
-        # Formatear timestamp
-        if 'timestamp' in processed and processed['timestamp']:
-            try:
-                dt = datetime.fromisoformat(str(processed['timestamp']).replace('Z', '+00:00'))
-                processed['timestamp'] = dt.strftime('%d/%m/%Y %H:%M:%S')
-            except:
-                pass
-        
-        # Formatear JSON values para legibilidad
-        for json_field in ['old_values', 'new_values']:
-            if json_field in processed and processed[json_field]:
+        for field in AUDIT_FIELDS:
+            value = record[field]
+            
+            if field == 'timestamp' and value:
+                # Formatear timestamp
+                value = _format_iso_datetime(value)
+            elif (field in AUDIT_JSON_FIELDS and isinstance(value, str)
+                  and value.startswith('{')):
+                # Formatear JSON values para legibilidad
                 try:
-                    import json
-                    data = json.loads(processed[json_field])
                     # Convertir a string legible
-                    formatted_items = []
-                    for key, value in data.items():
-                        formatted_items.append(f"{key}: {value}")
-                    processed[json_field] = "; ".join(formatted_items)
-                except:
-                    pass  # Mantener valor original
-        
-        # Limpiar campos None
-        for key, value in processed.items():
-            if value is None:
-                processed[key] = ''
+                    value = "; ".join(map(_kv_fmt, _json_loads(value).items()))
+                except ValueError:
+                    pass  # JSON inválido: mantener valor original
+            
+            # Limpiar campos None
+            processed.append('' if value is None else value)
         
-        return processed
+        return tuple(processed)
     
-    def _format_dataframe_for_export(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Formatea un DataFrame para exportación."""
-        df_formatted = df.copy()
-        
+    def _compute_column_widths(self, df: "pd.DataFrame") -> List[int]:
+        """Calcula el ancho de cada columna (máximo 50) según su contenido."""
+        widths = []
+        for col in df.columns:
+            max_length = len(col)
+            if len(df):
+                max_length = max(max_length, int(df[col].astype(str).str.len().max()))
+            widths.append(min(max_length + 2, 50))
+        return widths
+    
+    def _format_dataframe_for_export(self, df: "pd.DataFrame") -> "pd.DataFrame":
+        """Formatea en el mismo DataFrame (ya copiado y renombrado) para exportación."""
         # Formatear columnas de fecha
         date_columns = ['Fecha Homologación', 'Fecha Creación', 'Última Actualización']
         for col in date_columns:
-            if col in df_formatted.columns:
-                df_formatted[col] = pd.to_datetime(df_formatted[col], errors='coerce')
-                df_formatted[col] = df_formatted[col].dt.strftime('%d/%m/%Y %H:%M:%S')
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors='coerce').dt.strftime('%d/%m/%Y %H:%M:%S')
         
         # Formatear columna de versiones previas
-        if 'Versiones Previas' in df_formatted.columns:
-            df_formatted['Versiones Previas'] = df_formatted['Versiones Previas'].map(
-                {True: 'Sí', False: 'No', 1: 'Sí', 0: 'No'}
-            ).fillna('No')
+        if 'Versiones Previas' in df.columns:
+            df['Versiones Previas'] = np.where(
+                df['Versiones Previas'].isin([True, 1]), 'Sí', 'No'
+            )
         
         # Rellenar valores None/NaN
-        df_formatted = df_formatted.fillna('')
+        df.fillna('', inplace=True)
         
-        return df_formatted
+        return df
     
     def get_export_summary(self, export_type: str, record_count: int, 
                           filename: str) -> Dict[str, Any]:
@@ -367,29 +430,40 @@ class DataExporter:
             'filename': os.path.basename(filename),
             'file_size': os.path.getsize(filename) if os.path.exists(filename) else 0,
             'export_timestamp': datetime.now().isoformat(),
-            'pandas_available': PANDAS_AVAILABLE
+            'pandas_available': PANDAS_AVAILABLE,
+            'excel_engine': EXCEL_ENGINE
         }
 
 
+# Instancia global del exportador
+_data_exporter = None
+
+def get_data_exporter() -> DataExporter:
+    """Retorna la instancia global del exportador de datos."""
+    global _data_exporter
+    if _data_exporter is None:
+        _data_exporter = DataExporter()
+    return _data_exporter
+
+
 def export_homologations_csv(filename: str, filters: Dict[str, Any] = None, 
-                           user_id: int = None) -> bool:
+                           user_id: int = None,
+                           progress_cb: Optional[Callable[[int], None]] = None) -> bool:
     """Función utilitaria para exportar homologaciones a CSV."""
-    exporter = DataExporter()
-    return exporter.export_homologations_to_csv(filename, filters, user_id)
+    return get_data_exporter().export_homologations_to_csv(filename, filters, user_id, progress_cb)
 
 
 def export_homologations_excel(filename: str, filters: Dict[str, Any] = None,
                              user_id: int = None) -> bool:
     """Función utilitaria para exportar homologaciones a Excel."""
-    exporter = DataExporter()
-    return exporter.export_homologations_to_excel(filename, filters, user_id)
+    return get_data_exporter().export_homologations_to_excel(filename, filters, user_id)
 
 
 def export_audit_trail_csv(filename: str, filters: Dict[str, Any] = None,
-                          user_id: int = None) -> bool:
+                          user_id: int = None,
+                          progress_cb: Optional[Callable[[int], None]] = None) -> bool:
     """Función utilitaria para exportar trail de auditoría a CSV."""
-    exporter = DataExporter()
-    return exporter.export_audit_trail_to_csv(filename, filters, user_id)
+    return get_data_exporter().export_audit_trail_to_csv(filename, filters, user_id, progress_cb)
 
 
 def generate_filename(base_name: str, extension: str, include_timestamp: bool = True) -> str:
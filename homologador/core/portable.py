@@ -9,8 +9,18 @@ Funciones helper para manejo de rutas portátiles
 
 import os
 import sys
+from functools import lru_cache
 from pathlib import Path
 
+# Las rutas no cambian durante la ejecución, por lo que se calculan una sola vez.
+# Si algún flujo reubica la BD, invalidar con get_database_path.cache_clear().
+
+# Base de los recursos: carpeta de PyInstaller o directorio de trabajo al importar
+_BASE = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.abspath(".")
+
+# Información de la aplicación, construida en la primera llamada a get_app_info
+_APP_INFO = None
+
 def get_resource_path(relative_path):
     """
     Obtiene la ruta absoluta a un recurso, compatible con PyInstaller
@@ -21,19 +31,9 @@ def get_resource_path(relative_path):
     Returns:
         str: Ruta absoluta al recurso
     """
-    try:
-        # Si está ejecutándose como ejecutable PyInstaller
-        if hasattr(sys, '_MEIPASS'):
-            base_path = sys._MEIPASS
-        else:
-            # Si está ejecutándose como script Python
-            base_path = os.path.abspath(".")
-        
-        return os.path.join(base_path, relative_path)
-    except Exception:
-        # Fallback: usar ruta relativa
-        return relative_path
+    return os.path.join(_BASE, relative_path)
 
+@lru_cache(maxsize=1)
 def get_database_path():
     """
     Obtiene la ruta a la base de datos SIEMPRE en la carpeta del ejecutable
@@ -56,6 +56,7 @@ def get_database_path():
         print(f"[DESARROLLO] Script Python, BD en: {db_path}")
         return db_path
 
+@lru_cache(maxsize=1)
 def get_images_path():
     """
     Obtiene la ruta a la carpeta de imágenes
@@ -65,6 +66,7 @@ def get_images_path():
     """
     return get_resource_path("images")
 
+@lru_cache(maxsize=1)
 def get_backups_path():
     """
     Obtiene la ruta a la carpeta de backups
@@ -73,12 +75,9 @@ def get_backups_path():
         str: Ruta a la carpeta de backups
     """
     # La carpeta de backups debe estar en el directorio de trabajo
-    backups_dir = os.path.join(os.getcwd(), "backups")
-    
-    # Crear si no existe
-    os.makedirs(backups_dir, exist_ok=True)
-    
-    return backups_dir
+    # (se crea en ensure_portable_structure). Se toma el directorio de la
+    # primera llamada; un os.chdir posterior no la mueve.
+    return os.path.join(os.getcwd(), "backups")
 
 def ensure_portable_structure():
     """
@@ -102,22 +101,27 @@ def get_app_info():
     """
     Retorna información de la aplicación para debugging
     
+    La información se construye una sola vez (directorio de trabajo incluido)
+    y se retorna una copia en cada llamada.
+    
     Returns:
         dict: Información de la aplicación
     """
-    info = {
-        "is_frozen": hasattr(sys, '_MEIPASS'),
-        "executable_path": sys.executable,
-        "working_directory": os.getcwd(),
-        "database_path": get_database_path(),
-        "images_path": get_images_path(),
-        "backups_path": get_backups_path()
-    }
-    
-    if hasattr(sys, '_MEIPASS'):
-        info["meipass"] = sys._MEIPASS
+    global _APP_INFO
+    if _APP_INFO is None:
+        _APP_INFO = {
+            "is_frozen": hasattr(sys, '_MEIPASS'),
+            "executable_path": sys.executable,
+            "working_directory": os.getcwd(),
+            "database_path": get_database_path(),
+            "images_path": get_images_path(),
+            "backups_path": get_backups_path()
+        }
+        
+        if hasattr(sys, '_MEIPASS'):
+            _APP_INFO["meipass"] = sys._MEIPASS
     
-    return info
+    return _APP_INFO.copy()
 
 def print_portable_debug():
     """
@@ -1,208 +1,230 @@
 """
 Sistema de configuración para el Homologador de Aplicaciones.
-Maneja la configuración desde múltiples fuentes: CLI, ENV, config.json, autodetección.
+Maneja la configuración desde múltiples fuentes: CLI, ENV, config.json.
 """
 
 import os
+import sys
 import json
 import argparse
 import logging
 from pathlib import Path
-from typing import Optional, Dict, Any
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Mapping, Set, Tuple
+
+# orjson parsea JSON en C; la librería estándar queda como alternativa
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Rutas portables (carpeta del ejecutable); se importa una sola vez
+try:
+    from . import portable
+    _PORTABLE_IMPORT_ERROR = None
+except ImportError as e:
+    portable = None
+    _PORTABLE_IMPORT_ERROR = e
 
 logger = logging.getLogger(__name__)
 
+# config.json ya parseados: ruta absoluta -> (st_mtime_ns, st_size, contenido)
+_CONFIG_CACHE: Dict[str, Tuple[int, int, Dict[str, Any]]] = {}
+
+# Configuración por defecto (prioridad más baja)
+_DEFAULT_CONFIG: Dict[str, Any] = {
+    "db_path": "homologador.db",
+    "backups_dir": "backups/",
+    "backup_retention_days": 30,
+    "auto_backup": True,
+    "auto_backup_interval_seconds": 600,
+    # Argon2: costo en tiempo, memoria (KiB) e hilos; argon2_target_ms > 0
+    # calibra la memoria una vez para que un hash tarde ~ese tiempo y guarda
+    # el resultado en config.json (argon2_calibrated_target_ms)
+    "argon2_time_cost": 3,
+    "argon2_memory_cost_kib": 65536,
+    "argon2_parallelism": 4,
+    "argon2_target_ms": 0
+}
+
+# Carpeta base de respaldo si portable no está disponible: la del ejecutable
+# (PyInstaller) o el directorio de trabajo al importar
+_BASE_DIR = os.path.dirname(sys.executable) if hasattr(sys, '_MEIPASS') else os.path.abspath(".")
+
+# Directorios ya creados/verificados en este proceso
+_ENSURED_DIRS: Set[str] = set()
+
+# Variables de entorno -> (clave de configuración, conversión de tipo)
+_ENV_MAPPINGS = (
+    ("HOMOLOGADOR_DB", "db_path", str),
+    ("HOMOLOGADOR_BACKUPS", "backups_dir", str),
+    ("HOMOLOGADOR_RETENTION_DAYS", "backup_retention_days", int),
+)
+
+# Parser de argumentos CLI, construido una sola vez
+_CLI_PARSER = argparse.ArgumentParser(description="Homologador de Aplicaciones")
+_CLI_PARSER.add_argument("--db", help="Ruta a la base de datos SQLite")
+_CLI_PARSER.add_argument("--backups", help="Directorio de backups")
+_CLI_PARSER.add_argument("--debug", action="store_true", help="Habilitar modo debug")
+
 
 class Settings:
     """Clase para manejar toda la configuración de la aplicación."""
     
+    __slots__ = ("config", "_db_path", "_backups_dir", "_resolved")
+    
     def __init__(self):
         self.config: Dict[str, Any] = {}
+        # Rutas finales ya resueltas (ver _resolve_paths)
+        self._db_path: Optional[Path] = None
+        self._backups_dir: Optional[Path] = None
+        self._resolved = False
         self._load_config()
     
     def _load_config(self):
         """Carga la configuración desde múltiples fuentes en orden de prioridad."""
-        # 1. Configuración por defecto
+        # Defaults < config.json < variables de entorno < argumentos CLI
         self.config = {
-            "db_path": "homologador.db",
-            "backups_dir": "backups/",
-            "backup_retention_days": 30,
-            "auto_backup": True,
-            "onedrive_paths": [
-                "C:\\Users\\{username}\\OneDrive",
-                "C:\\Users\\{username}\\OneDrive - {organization}",
-                "\\\\APPS$\\homologador"
-            ]
+            **_DEFAULT_CONFIG,
+            **self._load_from_config_file(),
+            **self._load_from_environment(),
+            **self._load_from_cli(),
         }
         
-        # 2. Cargar desde config.json
-        self._load_from_config_file()
-        
-        # 3. Variables de entorno
-        self._load_from_environment()
-        
-        # 4. Argumentos CLI
-        self._load_from_cli()
-        
-        # 5. Resolver rutas finales
+        # Resolver rutas finales
         self._resolve_paths()
     
-    def _load_from_config_file(self):
-        """Carga configuración desde config.json."""
+    def _load_from_config_file(self) -> Dict[str, Any]:
+        """Retorna la configuración de config.json (vacía si no existe)."""
         config_path = Path("config.json")
-        if config_path.exists():
-            try:
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    file_config = json.load(f)
-                    self.config.update(file_config)
-                    logger.info(f"Configuración cargada desde {config_path}")
-            except Exception as e:
-                logger.warning(f"Error leyendo config.json: {e}")
+        cache_key = os.path.abspath(config_path)
+        
+        # Un único stat sirve para saber si existe y para validar el cache
+        try:
+            st = os.stat(cache_key)
+        except FileNotFoundError:
+            return {}
+        
+        try:
+            # Reutilizar el contenido parseado si el archivo no cambió
+            cached = _CONFIG_CACHE.get(cache_key)
+            if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                return cached[2]
+            
+            if orjson:
+                file_config = orjson.loads(config_path.read_bytes())
+            else:
+                file_config = json.loads(config_path.read_text(encoding='utf-8'))
+            
+            _CONFIG_CACHE[cache_key] = (st.st_mtime_ns, st.st_size, file_config)
+            logger.info("Configuración cargada desde %s", config_path)
+            return file_config
+        except Exception as e:
+            logger.warning("Error leyendo config.json: %s", e)
+            return {}
     
-    def _load_from_environment(self):
-        """Carga configuración desde variables de entorno."""
-        env_mappings = {
-            "HOMOLOGADOR_DB": "db_path",
-            "HOMOLOGADOR_BACKUPS": "backups_dir",
-            "HOMOLOGADOR_RETENTION_DAYS": "backup_retention_days"
-        }
+    def _load_from_environment(self) -> Dict[str, Any]:
+        """Retorna la configuración definida en variables de entorno."""
+        env_config = {}
+        
+        env = os.environ
+        for env_var, config_key, convert in _ENV_MAPPINGS:
+            value = env.get(env_var)
+            if not value:
+                continue
+            
+            try:
+                value = convert(value)
+            except ValueError:
+                logger.warning("Valor inválido para %s: %s", env_var, value)
+                continue
+            
+            env_config[config_key] = value
+            logger.info("Configuración desde ENV: %s = %s", config_key, value)
         
-        for env_var, config_key in env_mappings.items():
-            value = os.getenv(env_var)
-            if value:
-                # Convertir tipos según sea necesario
-                if config_key == "backup_retention_days":
-                    try:
-                        value = int(value)
-                    except ValueError:
-                        logger.warning(f"Valor inválido para {env_var}: {value}")
-                        continue
-                
-                self.config[config_key] = value
-                logger.info(f"Configuración desde ENV: {config_key} = {value}")
+        return env_config
     
-    def _load_from_cli(self):
-        """Carga configuración desde argumentos CLI."""
-        parser = argparse.ArgumentParser(description="Homologador de Aplicaciones")
-        parser.add_argument("--db", help="Ruta a la base de datos SQLite")
-        parser.add_argument("--backups", help="Directorio de backups")
-        parser.add_argument("--debug", action="store_true", help="Habilitar modo debug")
+    def _load_from_cli(self) -> Dict[str, Any]:
+        """Retorna la configuración indicada por argumentos CLI."""
+        cli_config = {}
+        
+        # Sin argumentos (p. ej. lanzado desde el explorador) no hay nada que parsear
+        if len(sys.argv) <= 1:
+            return cli_config
         
         # Solo parsear argumentos conocidos para evitar conflictos con PyQt
-        args, unknown = parser.parse_known_args()
+        args, unknown = _CLI_PARSER.parse_known_args()
         
         if args.db:
-            self.config["db_path"] = args.db
-            logger.info(f"DB path desde CLI: {args.db}")
+            cli_config["db_path"] = args.db
+            logger.info("DB path desde CLI: %s", args.db)
         
         if args.backups:
-            self.config["backups_dir"] = args.backups
-            logger.info(f"Backups dir desde CLI: {args.backups}")
+            cli_config["backups_dir"] = args.backups
+            logger.info("Backups dir desde CLI: %s", args.backups)
         
         if args.debug:
-            self.config["debug"] = True
+            cli_config["debug"] = True
             logging.getLogger().setLevel(logging.DEBUG)
+        
+        return cli_config
     
     def _resolve_paths(self):
         """
         Resuelve las rutas finales FORZANDO el uso de la carpeta del ejecutable.
         NO autodetección de OneDrive - SOLO carpeta local del ejecutable.
         """
-        # IMPORTAR función portable para forzar ubicación local
-        try:
-            from .portable import get_database_path, get_backups_path
-            
+        # Usar funciones portables para forzar ubicación local
+        if portable is not None:
             # FORZAR ubicación de BD en carpeta del ejecutable
-            self.config["db_path"] = get_database_path()
-            logger.info(f"🔧 [FORZADO] BD ubicada en: {self.config['db_path']}")
+            self.config["db_path"] = portable.get_database_path()
+            logger.info("🔧 [FORZADO] BD ubicada en: %s", self.config['db_path'])
             
             # FORZAR ubicación de backups en carpeta del ejecutable
-            self.config["backups_dir"] = get_backups_path()
-            logger.info(f"🔧 [FORZADO] Backups en: {self.config['backups_dir']}")
+            self.config["backups_dir"] = portable.get_backups_path()
+            logger.info("🔧 [FORZADO] Backups en: %s", self.config['backups_dir'])
             
-        except ImportError as e:
-            logger.error(f"Error importando portable: {e}")
-            # Fallback: usar directorio actual
-            import sys
-            if hasattr(sys, '_MEIPASS'):
-                # Ejecutable
-                base_dir = os.path.dirname(sys.executable)
-            else:
-                # Script
-                base_dir = os.path.abspath(".")
-            
-            self.config["db_path"] = os.path.join(base_dir, "homologador.db")
-            self.config["backups_dir"] = os.path.join(base_dir, "backups")
-            logger.warning(f"🔧 [FALLBACK] BD en: {self.config['db_path']}")
+        else:
+            logger.error("Error importando portable: %s", _PORTABLE_IMPORT_ERROR)
+            # Fallback: carpeta del ejecutable o directorio actual
+            self.config["db_path"] = os.path.join(_BASE_DIR, "homologador.db")
+            self.config["backups_dir"] = os.path.join(_BASE_DIR, "backups")
+            logger.warning("🔧 [FALLBACK] BD en: %s", self.config['db_path'])
+        
+        # Guardar las rutas resueltas para no reprocesarlas en cada consulta
+        self._db_path = Path(self.config["db_path"]).resolve()
+        self._backups_dir = Path(self.config["backups_dir"]).resolve()
+        self._resolved = True
         
         # Crear directorios si no existen
         self._ensure_directories()
     
-    def _detect_onedrive_path(self) -> Optional[str]:
-        """Detecta automáticamente la ruta de OneDrive o carpeta compartida."""
-        username = os.getenv("USERNAME", "")
-        
-        # Rutas a probar
-        paths_to_try = []
-        
-        # Expandir plantillas en config
-        for path_template in self.config.get("onedrive_paths", []):
-            path = path_template.format(username=username, organization="*")
-            paths_to_try.append(path)
-        
-        # Rutas adicionales comunes
-        if username:
-            paths_to_try.extend([
-                f"C:\\Users\\{username}\\OneDrive\\Documentos\\Homologador",
-                f"C:\\Users\\{username}\\OneDrive\\Documents\\Homologador",
-                f"C:\\Users\\{username}\\OneDrive",
-            ])
-        
-        # Rutas de red
-        paths_to_try.extend([
-            "\\\\APPS$\\homologador",
-            "\\\\shared\\homologador",
-        ])
-        
-        for path in paths_to_try:
-            try:
-                # Para rutas con wildcard, usar glob
-                if "*" in path:
-                    import glob
-                    matches = glob.glob(path)
-                    if matches and os.path.isdir(matches[0]):
-                        logger.info(f"OneDrive detectado (glob): {matches[0]}")
-                        return matches[0]
-                elif os.path.isdir(path):
-                    logger.info(f"OneDrive detectado: {path}")
-                    return path
-            except Exception as e:
-                logger.debug(f"Error probando ruta {path}: {e}")
-        
-        logger.warning("No se pudo detectar automáticamente OneDrive")
-        return None
-    
     def _ensure_directories(self):
         """Crea los directorios necesarios si no existen."""
         dirs_to_create = [
-            os.path.dirname(self.config["db_path"]),
-            self.config["backups_dir"]
+            str(self._db_path.parent),
+            str(self._backups_dir)
         ]
         
         for dir_path in dirs_to_create:
-            if dir_path:
+            if dir_path and dir_path not in _ENSURED_DIRS:
                 try:
-                    Path(dir_path).mkdir(parents=True, exist_ok=True)
-                    logger.debug(f"Directorio asegurado: {dir_path}")
+                    os.makedirs(dir_path, exist_ok=True)
+                    _ENSURED_DIRS.add(dir_path)
+                    logger.debug("Directorio asegurado: %s", dir_path)
                 except Exception as e:
-                    logger.error(f"Error creando directorio {dir_path}: {e}")
+                    logger.error("Error creando directorio %s: %s", dir_path, e)
     
     def get_db_path(self) -> str:
         """Retorna la ruta completa de la base de datos."""
+        if self._resolved:
+            return str(self._db_path)
         return self.config["db_path"]
     
     def get_backups_dir(self) -> str:
         """Retorna el directorio de backups."""
+        if self._resolved:
+            return str(self._backups_dir)
         return self.config["backups_dir"]
     
     def get_backup_retention_days(self) -> int:
@@ -213,27 +235,87 @@ class Settings:
         """Retorna si el backup automático está habilitado."""
         return self.config.get("auto_backup", True)
     
+    def get_auto_backup_interval_s(self) -> int:
+        """Retorna los segundos mínimos entre dos backups automáticos."""
+        return self.config.get("auto_backup_interval_seconds", 600)
+    
+    def get_db_synchronous(self) -> str:
+        """Retorna el modo PRAGMA synchronous de SQLite (NORMAL por defecto; FULL para máxima seguridad ante cortes)."""
+        mode = str(self.config.get("db_synchronous", "NORMAL")).upper()
+        if mode not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            logger.warning("Valor inválido para db_synchronous: %s", mode)
+            return "NORMAL"
+        return mode
+    
+    def get_argon2_params(self) -> Dict[str, int]:
+        """
+        Retorna los parámetros de Argon2 para hashes nuevos.
+        
+        No dependen de la máquina (p. ej. de sus núcleos): la BD portable se
+        abre desde equipos distintos y todos deben generar los mismos hashes.
+        """
+        return {
+            "time_cost": max(1, int(self.config.get("argon2_time_cost", 3))),
+            "memory_cost": max(8, int(self.config.get("argon2_memory_cost_kib", 65536))),
+            "parallelism": max(1, int(self.config.get("argon2_parallelism", 4))),
+        }
+    
+    def get_argon2_target_ms(self) -> int:
+        """Retorna la latencia objetivo de un hash Argon2 (0 = sin calibrar)."""
+        return int(self.config.get("argon2_target_ms", 0))
+    
+    def needs_argon2_calibration(self) -> bool:
+        """Retorna si hay que calibrar Argon2 (objetivo activo y aún no calibrado para él)."""
+        target_ms = self.get_argon2_target_ms()
+        return target_ms > 0 and self.config.get("argon2_calibrated_target_ms") != target_ms
+    
+    def save_config_values(self, values: Dict[str, Any]):
+        """
+        Guarda los valores indicados en config.json (conservando el resto del
+        archivo) y los aplica a la configuración activa.
+        """
+        config_path = Path("config.json")
+        file_config = dict(self._load_from_config_file())
+        file_config.update(values)
+        
+        # Escribir a un temporal y reemplazar de forma atómica
+        tmp_path = config_path.with_suffix(".json.tmp")
+        try:
+            tmp_path.write_text(json.dumps(file_config, ensure_ascii=False, indent=4), encoding='utf-8')
+            os.replace(tmp_path, config_path)
+        except OSError as e:
+            logger.warning("No se pudo guardar config.json: %s", e)
+        
+        self.config.update(values)
+    
     def is_debug_enabled(self) -> bool:
         """Retorna si el modo debug está habilitado."""
         return self.config.get("debug", False)
     
-    def get_config(self) -> Dict[str, Any]:
-        """Retorna toda la configuración."""
+    def get_config(self) -> Mapping[str, Any]:
+        """Retorna toda la configuración como vista de solo lectura."""
+        return MappingProxyType(self.config)
+    
+    def get_config_copy(self) -> Dict[str, Any]:
+        """Retorna una copia modificable de toda la configuración."""
         return self.config.copy()
 
 
-# Instancia global de configuración
-settings = Settings()
+# Instancia global de configuración (se crea en el primer uso)
+_settings = None
 
 
 def get_settings() -> Settings:
     """Retorna la instancia global de configuración."""
-    return settings
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
 
 
 def setup_logging():
     """Configura el logging de la aplicación."""
-    level = logging.DEBUG if settings.is_debug_enabled() else logging.INFO
+    level = logging.DEBUG if get_settings().is_debug_enabled() else logging.INFO
     
     logging.basicConfig(
         level=level,
@@ -5,19 +5,198 @@ Maneja la base de datos SQLite con WAL mode, file locking y backups automáticos
 
 import sqlite3
 import os
-import shutil
+import atexit
+import threading
+import time
 import json
 import logging
+import weakref
 import portalocker
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Tuple
-from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Tuple, Iterator, Literal
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+
+# orjson serializa JSON en C; la librería estándar queda como alternativa
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from .settings import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Rutas de datos del paquete, calculadas una sola vez al importar
+_DATA_DIR = Path(__file__).parent.parent / "data"
+_SCHEMA_PATH = _DATA_DIR / "schema.sql"
+_MIGRATIONS_DIR = _DATA_DIR / "migrations"
+
+# Filas leídas por lote en iter_query
+ITER_QUERY_BATCH_SIZE = 200
+
+# Segundos mínimos entre dos limpiezas de backups antiguos
+BACKUP_CLEANUP_INTERVAL_S = 3600
+
+# Segundos entre dos PRAGMA optimize sobre la conexión de escritura
+OPTIMIZE_INTERVAL_S = 3600
+
+# Segundos entre dos checkpoints PASSIVE del WAL en segundo plano
+WAL_CHECKPOINT_INTERVAL_S = 30
+
+# Tipos JSON escalares cuya serialización puede memoizarse de forma segura
+_JSON_PRIMITIVES = (str, int, float, bool, type(None))
+
+
+def _json_default(value: Any) -> str:
+    """Convierte a texto los valores que JSON no soporta (fechas en ISO 8601, como orjson)."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _dumps(values: Dict[str, Any]) -> str:
+    """
+    Serializa a texto JSON compacto con orjson si está disponible.
+    
+    La alternativa con json produce el mismo texto (sin espacios y sin escapar
+    no-ASCII), así lo guardado en audit_logs no depende de la librería instalada.
+    """
+    if orjson:
+        return orjson.dumps(values, default=_json_default,
+                            option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(values, separators=(',', ':'), ensure_ascii=False, default=_json_default)
+
+
+@lru_cache(maxsize=512)
+def _encode_small_json(items: Tuple[Tuple[str, type, Any], ...]) -> str:
+    """Serializa (con cache) un diccionario pequeño de valores primitivos."""
+    return _dumps({key: value for key, _, value in items})
+
+
+def _encode_json(values: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Serializa valores de auditoría a JSON.
+    
+    Los diccionarios pequeños de valores primitivos (p. ej. {"forced": False})
+    se repiten constantemente, así que su serialización se memoiza. El tipo
+    forma parte de la clave para no confundir True con 1.
+    """
+    if not values:
+        return None
+    if len(values) <= 4 and all(isinstance(v, _JSON_PRIMITIVES) for v in values.values()):
+        return _encode_small_json(tuple((k, type(v), v) for k, v in values.items()))
+    return _dumps(values)
+
+
+@lru_cache(maxsize=256)
+def _is_write_query(query: str) -> bool:
+    """Indica si la consulta modifica datos (las sentencias empiezan con el verbo)."""
+    return query.lstrip()[:8].upper().startswith(("INSERT", "UPDATE", "DELETE"))
+
+
+# Filtros de get_all: clave -> condición SQL (en orden fijo de generación)
+_HOMOLOGATION_FILTERS = (
+    ('search_term', "(real_name LIKE ? OR logical_name LIKE ? OR details LIKE ? OR kb_url LIKE ?)"),
+    ('real_name', "real_name LIKE ?"),
+    ('logical_name', "logical_name LIKE ?"),
+    ('date_from', "homologation_date >= ?"),
+    ('date_to', "homologation_date <= ?"),
+    ('repository_location', "repository_location = ?"),
+)
+
+# Búsqueda sobre el índice FTS5 (trigram) cuando está disponible
+_SEARCH_FTS_CONDITION = "id IN (SELECT rowid FROM homologations_fts WHERE homologations_fts MATCH ?)"
+
+# El tokenizador trigram necesita al menos 3 caracteres para buscar
+FTS_MIN_TERM_LENGTH = 3
+
+# Filtros del trail de auditoría: clave -> condición SQL
+_AUDIT_FILTERS = (
+    ('user_id', "user_id = ?"),
+    ('action', "action = ?"),
+    ('table_name', "table_name = ?"),
+    ('date_from', "timestamp >= ?"),
+    ('date_to', "timestamp <= ?"),
+)
+
+
+@lru_cache(maxsize=64)
+def _homologation_query_sql(keys: Tuple[str, ...], use_fts: bool = False) -> str:
+    """
+    Retorna el SQL de get_all para la combinación de filtros presentes.
+    
+    Memoizado por forma de filtro: la UI repite pocas combinaciones y así se
+    evita reconstruir el texto en cada refresco de la lista. Con use_fts, el
+    filtro 'search_term' usa el índice FTS5 en lugar de cuatro LIKE.
+    """
+    conditions = dict(_HOMOLOGATION_FILTERS)
+    if use_fts:
+        conditions['search_term'] = _SEARCH_FTS_CONDITION
+    query = "SELECT * FROM v_homologations_with_user"
+    
+    if keys:
+        query += " WHERE " + " AND ".join(conditions[key] for key in keys)
+    
+    if 'search_term' in keys:
+        # Con búsqueda: primero coincidencias por nombre real, luego lógico
+        query += """
+            ORDER BY 
+                CASE 
+                    WHEN real_name LIKE ? THEN 1
+                    WHEN logical_name LIKE ? THEN 2
+                    ELSE 3
+                END,
+                created_at DESC"""
+    else:
+        query += " ORDER BY created_at DESC"
+    
+    return query
+
+
+@lru_cache(maxsize=64)
+def _audit_trail_query_sql(keys: Tuple[str, ...]) -> str:
+    """Retorna el SQL del trail de auditoría para la combinación de filtros presentes."""
+    conditions = dict(_AUDIT_FILTERS)
+    query = "SELECT * FROM v_audit_with_user"
+    
+    if keys:
+        query += " WHERE " + " AND ".join(conditions[key] for key in keys)
+    
+    return query + " ORDER BY timestamp DESC LIMIT 1000"
+
+
+# Campos de homologations que update() puede modificar
+_UPDATABLE_FIELDS = (
+    'real_name', 'logical_name', 'kb_url', 'kb_sync', 'homologation_date',
+    'has_previous_versions', 'repository_location', 'details', 'status'
+)
+
+
+@lru_cache(maxsize=64)
+def _homologation_update_sql(keys: Tuple[str, ...]) -> str:
+    """Retorna el UPDATE de homologations para la combinación de campos dada."""
+    return f"UPDATE homologations SET {', '.join(f'{key} = ?' for key in keys)} WHERE id = ?"
+
+
+@lru_cache(maxsize=1)
+def _migration_files() -> Tuple[Path, ...]:
+    """Retorna los archivos de migración ordenados (se listan una sola vez)."""
+    if not _MIGRATIONS_DIR.exists():
+        _MIGRATIONS_DIR.mkdir(parents=True, exist_ok=True)
+        return ()
+    return tuple(sorted(_MIGRATIONS_DIR.glob("*.sql")))
+
+
+class _ReaderSlot:
+    """Conexión de lectura propia de un hilo (referenciable débilmente)."""
+    
+    __slots__ = ("conn", "__weakref__")
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
 
 class DatabaseError(Exception):
     """Excepción personalizada para errores de base de datos."""
@@ -32,19 +211,70 @@ class DatabaseManager:
         self.db_path = self.settings.get_db_path()
         self.backups_dir = self.settings.get_backups_dir()
         self._lock_file = None
+        # Una única conexión de escritura, compartida y serializada con su
+        # lock, y una conexión de solo lectura por hilo (en modo WAL las
+        # lecturas no necesitan esperar a las escrituras ni entre sí)
         self._connection = None
+        self._thread_lock = threading.RLock()
+        self._tls = threading.local()
+        # Conexiones de lectura abiertas, para cerrarlas en close(); al
+        # terminar un hilo su slot se libera y la conexión se cierra sola
+        self._read_slots = weakref.WeakSet()
+        self._read_lock = threading.Lock()
+        # Se incrementa en cada escritura; permite invalidar caches derivadas
+        self.data_version = 0
+        # Indica si existe el índice FTS5 de búsqueda (ver initialize_database)
+        self.fts_enabled = False
+        # Momento (time.monotonic) del último backup automático
+        self._last_auto_backup = None
+        # Momento (time.monotonic) de la última limpieza de backups antiguos
+        self._last_cleanup_t = None
+        # En modo WAL, synchronous=NORMAL no arriesga corrupción y evita un
+        # fsync por commit (configurable con db_synchronous = FULL)
+        self._connection_pragmas = (
+            "PRAGMA foreign_keys = ON;"
+            "PRAGMA journal_mode = WAL;"
+            "PRAGMA busy_timeout = 30000;"
+            f"PRAGMA synchronous = {self.settings.get_db_synchronous()};"
+            "PRAGMA temp_store = MEMORY;"
+            "PRAGMA cache_size = -65536;"
+            "PRAGMA mmap_size = 268435456;"
+            # Sin autocheckpoint: el WAL se vuelca desde un timer en segundo
+            # plano para que ningún commit cargue con el checkpoint
+            "PRAGMA wal_autocheckpoint = 0;"
+            # Al abrir: analiza también tablas nunca analizadas (0x10002)
+            "PRAGMA optimize = 0x10002;"
+        )
+        # La conexión de lectura se abre en modo solo lectura: no necesita
+        # pragmas de escritura y query_only impide modificaciones accidentales
+        self._read_connection_pragmas = (
+            "PRAGMA busy_timeout = 30000;"
+            "PRAGMA temp_store = MEMORY;"
+            "PRAGMA cache_size = -65536;"
+            "PRAGMA mmap_size = 268435456;"
+            "PRAGMA query_only = 1;"
+        )
+        # Optimización periódica mientras el proceso sigue abierto
+        self._optimize_timer = None
+        self._schedule_optimize()
+        self._checkpoint_timer = None
+        self._schedule_checkpoint()
+        atexit.register(self.close)
         
     def initialize_database(self):
         """Inicializa la base de datos creando el esquema si no existe."""
         try:
             # Crear backup antes de cualquier operación
             if os.path.exists(self.db_path):
-                self.create_backup("pre_init")
+                if self.create_backup("pre_init"):
+                    self._last_auto_backup = time.monotonic()
+            
+            # El lock del archivo se mantiene durante toda la vida del proceso
+            self._ensure_file_lock()
             
             with self.get_connection() as conn:
                 # Cargar y ejecutar el esquema
-                schema_path = Path(__file__).parent.parent / "data" / "schema.sql"
-                with open(schema_path, 'r', encoding='utf-8') as f:
+                with open(_SCHEMA_PATH, 'r', encoding='utf-8') as f:
                     schema_sql = f.read()
                 
                 conn.executescript(schema_sql)
@@ -55,6 +285,11 @@ class DatabaseManager:
                 # Aplicar migraciones
                 self._apply_migrations(conn)
                 
+                # Sin FTS5 (SQLite antiguo) la búsqueda sigue usando LIKE
+                self.fts_enabled = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'homologations_fts'"
+                ).fetchone() is not None
+                
         except Exception as e:
             logger.error(f"Error inicializando base de datos: {e}")
             raise DatabaseError(f"Error inicializando base de datos: {e}")
@@ -62,12 +297,7 @@ class DatabaseManager:
     def _apply_migrations(self, conn):
         """Aplica las migraciones disponibles en la carpeta de migraciones."""
         try:
-            migrations_dir = Path(__file__).parent.parent / "data" / "migrations"
-            if not migrations_dir.exists():
-                migrations_dir.mkdir(parents=True, exist_ok=True)
-                return
-            
-            for migration_file in sorted(migrations_dir.glob("*.sql")):
+            for migration_file in _migration_files():
                 logger.info(f"Aplicando migración: {migration_file.name}")
                 with open(migration_file, 'r', encoding='utf-8') as f:
                     migration_sql = f.read()
@@ -82,44 +312,153 @@ class DatabaseManager:
                     
         except Exception as e:
             logger.error(f"Error al aplicar migraciones: {e}")
-    
-    @contextmanager
-    def get_connection(self):
-        """Context manager para obtener una conexión con lock automático."""
-        lock_acquired = False
-        conn = None
         
-        try:
-            # Adquirir lock del archivo
-            self._acquire_file_lock()
-            lock_acquired = True
+        # Las migraciones pueden crear índices nuevos
+        conn.execute("PRAGMA optimize")
+    
+    def _schedule_optimize(self):
+        """Programa el siguiente PRAGMA optimize periódico (hilo daemon)."""
+        self._optimize_timer = threading.Timer(OPTIMIZE_INTERVAL_S, self._periodic_optimize)
+        self._optimize_timer.daemon = True
+        self._optimize_timer.start()
+    
+    def _periodic_optimize(self):
+        """Ejecuta PRAGMA optimize sobre la conexión de escritura y reprograma."""
+        with self._thread_lock:
+            if self._connection is not None:
+                try:
+                    self._connection.execute("PRAGMA optimize")
+                except sqlite3.Error as e:
+                    logger.warning(f"Error en PRAGMA optimize: {e}")
             
-            # Conectar a la base de datos
-            conn = sqlite3.connect(
-                self.db_path,
-                timeout=30.0,
-                check_same_thread=False
-            )
+            # close() anula el timer: en ese caso no se reprograma
+            if self._optimize_timer is not None:
+                self._schedule_optimize()
+    
+    def _schedule_checkpoint(self):
+        """Programa el siguiente checkpoint PASSIVE del WAL (hilo daemon)."""
+        self._checkpoint_timer = threading.Timer(WAL_CHECKPOINT_INTERVAL_S, self._periodic_checkpoint)
+        self._checkpoint_timer.daemon = True
+        self._checkpoint_timer.start()
+    
+    def _periodic_checkpoint(self):
+        """Vuelca el WAL sin bloquear lectores ni escritores de otros procesos y reprograma."""
+        with self._thread_lock:
+            if self._connection is not None:
+                try:
+                    self._connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                except sqlite3.Error as e:
+                    logger.warning(f"Error en checkpoint del WAL: {e}")
             
-            # Configurar la conexión
-            conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA foreign_keys = ON")
-            conn.execute("PRAGMA journal_mode = WAL")
-            conn.execute("PRAGMA busy_timeout = 30000")
+            # close() anula el timer: en ese caso no se reprograma
+            if self._checkpoint_timer is not None:
+                self._schedule_checkpoint()
+    
+    def _open_connection(self, mode: Literal["r", "w"] = "w") -> sqlite3.Connection:
+        """Abre una conexión nueva de lectura (solo lectura) o de escritura."""
+        if mode == "r":
+            database = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            pragmas = self._read_connection_pragmas
+        else:
+            database = self.db_path
+            pragmas = self._connection_pragmas
+        
+        conn = sqlite3.connect(
+            database,
+            timeout=30.0,
+            check_same_thread=False,
+            # Cache de sentencias preparadas por conexión (por defecto 128)
+            cached_statements=256,
+            uri=(mode == "r")
+        )
+        conn.row_factory = sqlite3.Row
+        conn.executescript(pragmas)
+        return conn
+    
+    def _ensure_connection(self, mode: Literal["r", "w"] = "w") -> sqlite3.Connection:
+        """Retorna la conexión de lectura del hilo o la de escritura, abriéndola la primera vez."""
+        if mode == "r":
+            slot = getattr(self._tls, "slot", None)
+            if slot is None or slot.conn is None:
+                slot = _ReaderSlot(self._open_connection("r"))
+                self._tls.slot = slot
+                with self._read_lock:
+                    self._read_slots.add(slot)
+            return slot.conn
+        
+        if self._connection is None:
+            self._connection = self._open_connection()
+        return self._connection
+    
+    def close(self):
+        """
+        Cierra las conexiones compartidas y libera el lock del archivo.
+        Se invoca también al salir del proceso.
+        """
+        with self._thread_lock, self._read_lock:
+            for attr in ("_optimize_timer", "_checkpoint_timer"):
+                timer = getattr(self, attr)
+                if timer is not None:
+                    timer.cancel()
+                    setattr(self, attr, None)
             
-            yield conn
+            # Cada hilo reabrirá su conexión de lectura si vuelve a usarla
+            for slot in list(self._read_slots):
+                if slot.conn is not None:
+                    try:
+                        slot.conn.close()
+                    except sqlite3.Error as e:
+                        logger.warning(f"Error cerrando conexión: {e}")
+                    finally:
+                        slot.conn = None
+            self._read_slots.clear()
             
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            logger.error(f"Error en conexión de base de datos: {e}")
-            raise DatabaseError(f"Error de base de datos: {e}")
+            if self._connection is not None:
+                try:
+                    # Persistir las estadísticas recogidas durante la sesión
+                    self._connection.execute("PRAGMA optimize")
+                    self._connection.close()
+                except sqlite3.Error as e:
+                    logger.warning(f"Error cerrando conexión: {e}")
+                finally:
+                    self._connection = None
             
-        finally:
-            if conn:
-                conn.close()
-            if lock_acquired:
-                self._release_file_lock()
+            self._release_file_lock()
+    
+    def _ensure_file_lock(self):
+        """Adquiere el lock del archivo si este proceso aún no lo tiene."""
+        if self._lock_file is None:
+            # Lectores y escritores pueden llegar aquí a la vez
+            with self._thread_lock:
+                if self._lock_file is None:
+                    self._acquire_file_lock()
+    
+    @contextmanager
+    def get_connection(self, mode: Literal["r", "w"] = "w"):
+        """
+        Context manager para usar una conexión compartida con lock automático.
+        
+        mode="r" usa la conexión de solo lectura del hilo actual, sin lock;
+        mode="w" usa la conexión de escritura compartida, serializada con un
+        RLock. Las conexiones se reutilizan entre operaciones. El lock del
+        archivo solo protege las escrituras: se toma una sola vez y se libera
+        en close().
+        """
+        with (nullcontext() if mode == "r" else self._thread_lock):
+            conn = None
+            
+            try:
+                if mode != "r":
+                    self._ensure_file_lock()
+                
+                conn = self._ensure_connection(mode)
+                yield conn
+                
+            except Exception as e:
+                if conn and conn.in_transaction:
+                    conn.rollback()
+                logger.error(f"Error en conexión de base de datos: {e}")
+                raise DatabaseError(f"Error de base de datos: {e}")
     
     def _acquire_file_lock(self):
         """Adquiere un lock exclusivo del archivo de base de datos."""
@@ -131,15 +470,8 @@ class DatabaseManager:
             
             lock_path = f"{self.db_path}.lock"
             
-            # Intentar eliminar lock file anterior si existe
-            if os.path.exists(lock_path):
-                try:
-                    os.remove(lock_path)
-                    logger.debug(f"Lock file anterior eliminado: {lock_path}")
-                except PermissionError:
-                    logger.warning(f"No se pudo eliminar lock file anterior: {lock_path}")
-            
-            # Crear nuevo lock file
+            # Un lock file que quedó de una ejecución anterior no molesta: el
+            # sistema operativo libera el lock al terminar el proceso dueño
             self._lock_file = open(lock_path, 'w')
             portalocker.lock(self._lock_file, portalocker.LOCK_EX | portalocker.LOCK_NB)
             logger.debug(f"🔒 File lock adquirido: {lock_path}")
@@ -149,6 +481,10 @@ class DatabaseManager:
             logger.error(error_msg)
             raise DatabaseError(error_msg)
         except portalocker.LockException as e:
+            # El lock se mantiene por proceso: no dejar el archivo abierto sin lock
+            if self._lock_file:
+                self._lock_file.close()
+                self._lock_file = None
             error_msg = f"No se pudo adquirir lock exclusivo: {e}"
             logger.error(error_msg)
             raise DatabaseError(error_msg)
@@ -183,11 +519,12 @@ class DatabaseManager:
                 self._lock_file = None
     
     def create_backup(self, suffix: str = None) -> str:
-        """Crea un backup de la base de datos."""
-        if not os.path.exists(self.db_path):
-            logger.warning("No se puede hacer backup: base de datos no existe")
-            return None
-        
+        """
+        Crea un backup de la base de datos con la API de backup en línea de
+        SQLite, que copia páginas consistentes (incluido el WAL) aunque haya
+        escrituras en curso.
+        """
+        backup_path = None
         try:
             # Asegurar directorio de backups
             Path(self.backups_dir).mkdir(parents=True, exist_ok=True)
@@ -201,8 +538,20 @@ class DatabaseManager:
             
             backup_path = os.path.join(self.backups_dir, backup_name)
             
-            # Copiar archivo
-            shutil.copy2(self.db_path, backup_path)
+            if self._connection is not None:
+                # Copiar desde la conexión de escritura: bajo su lock ninguna
+                # escritura del proceso obliga a reiniciar la copia
+                with self.get_connection() as conn:
+                    self._copy_database(conn, backup_path)
+            else:
+                # Antes de abrir la conexión compartida (backup pre_init):
+                # fuente temporal de solo lectura, falla si la BD no existe
+                source_uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+                source = sqlite3.connect(source_uri, uri=True)
+                try:
+                    self._copy_database(source, backup_path)
+                finally:
+                    source.close()
             
             logger.info(f"Backup creado: {backup_path}")
             
@@ -211,26 +560,60 @@ class DatabaseManager:
             
             return backup_path
             
+        except sqlite3.OperationalError as e:
+            logger.warning(f"No se puede hacer backup: {e}")
+            self._discard_partial_backup(backup_path)
+            return None
         except Exception as e:
             logger.error(f"Error creando backup: {e}")
+            self._discard_partial_backup(backup_path)
             return None
     
+    @staticmethod
+    def _copy_database(source: sqlite3.Connection, backup_path: str):
+        """Copia la base de datos en bloques de 2000 páginas para no acaparar el GIL."""
+        target = sqlite3.connect(backup_path)
+        try:
+            source.backup(target, pages=2000)
+        finally:
+            target.close()
+    
+    @staticmethod
+    def _discard_partial_backup(backup_path: Optional[str]):
+        """Elimina un archivo de backup incompleto."""
+        if backup_path and os.path.exists(backup_path):
+            try:
+                os.remove(backup_path)
+            except OSError as e:
+                logger.warning(f"No se pudo eliminar backup incompleto {backup_path}: {e}")
+    
     def _cleanup_old_backups(self):
         """Elimina backups más antiguos que el período de retención."""
+        # La retención se mide en días: basta con revisar la carpeta cada hora
+        now = time.monotonic()
+        if self._last_cleanup_t is not None and now - self._last_cleanup_t < BACKUP_CLEANUP_INTERVAL_S:
+            return
+        self._last_cleanup_t = now
+        
         try:
             retention_days = self.settings.get_backup_retention_days()
-            cutoff_date = datetime.now() - timedelta(days=retention_days)
+            # Comparar st_mtime directamente contra un timestamp de corte
+            cutoff = (datetime.now() - timedelta(days=retention_days)).timestamp()
             
-            backups_path = Path(self.backups_dir)
-            if not backups_path.exists():
+            deleted_count = 0
+            try:
+                entries = os.scandir(self.backups_dir)
+            except FileNotFoundError:
                 return
             
-            deleted_count = 0
-            for backup_file in backups_path.glob("homologador_backup_*.db"):
-                file_time = datetime.fromtimestamp(backup_file.stat().st_mtime)
-                if file_time < cutoff_date:
-                    backup_file.unlink()
-                    deleted_count += 1
+            # scandir entrega nombre y stat de cada entrada en un solo recorrido
+            with entries:
+                for entry in entries:
+                    name = entry.name
+                    if (name.startswith("homologador_backup_") and name.endswith(".db")
+                            and entry.stat().st_mtime < cutoff):
+                        os.unlink(entry.path)
+                        deleted_count += 1
             
             if deleted_count > 0:
                 logger.info(f"Eliminados {deleted_count} backups antiguos")
@@ -240,49 +623,118 @@ class DatabaseManager:
     
     def execute_query(self, query: str, params: tuple = None) -> List[sqlite3.Row]:
         """Ejecuta una consulta SELECT y retorna los resultados."""
-        with self.get_connection() as conn:
+        with self.get_connection("r") as conn:
             cursor = conn.execute(query, params or ())
             return cursor.fetchall()
     
+    def iter_query(self, query: str, params: tuple = None,
+                   arraysize: int = ITER_QUERY_BATCH_SIZE) -> Iterator[sqlite3.Row]:
+        """
+        Ejecuta una consulta SELECT y entrega las filas por lotes de arraysize.
+        
+        Las filas se leen a medida que se consumen, así que un consumidor
+        lento (p. ej. una exportación) no retiene el resultado completo.
+        """
+        with self.get_connection("r") as conn:
+            cursor = conn.execute(query, params or ())
+        
+        # El lector es propio del hilo: el cursor se recorre sin más bloqueos
+        try:
+            while batch := cursor.fetchmany(arraysize):
+                yield from batch
+        finally:
+            cursor.close()
+    
+    def _auto_backup(self):
+        """Crea un backup automático si pasó el intervalo mínimo desde el anterior."""
+        now = time.monotonic()
+        if (self._last_auto_backup is not None
+                and now - self._last_auto_backup < self.settings.get_auto_backup_interval_s()):
+            return
+        
+        if self.create_backup("auto"):
+            self._last_auto_backup = now
+    
     def execute_non_query(self, query: str, params: tuple = None) -> int:
         """Ejecuta una consulta INSERT/UPDATE/DELETE y retorna rowcount."""
         # Crear backup automático antes de modificaciones
-        if self.settings.is_auto_backup_enabled() and any(
-            keyword in query.upper() for keyword in ['INSERT', 'UPDATE', 'DELETE']
-        ):
-            self.create_backup("auto")
+        if self.settings.is_auto_backup_enabled() and _is_write_query(query):
+            self._auto_backup()
         
         with self.get_connection() as conn:
+            # Tomar el lock de escritura al inicio; busy_timeout reintenta el BEGIN
+            conn.execute("BEGIN IMMEDIATE")
             cursor = conn.execute(query, params or ())
             conn.commit()
+            self.data_version += 1
             return cursor.rowcount
     
+    def execute_many(self, query: str, params_seq) -> int:
+        """
+        Ejecuta la misma sentencia para cada juego de parámetros dentro de una
+        única transacción (BEGIN IMMEDIATE) y retorna las filas afectadas.
+        """
+        if self.settings.is_auto_backup_enabled():
+            self._auto_backup()
+        
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.executemany(query, params_seq)
+            conn.commit()
+            self.data_version += 1
+            return cursor.rowcount
+    
+    def execute_transaction(self, statements) -> List[int]:
+        """
+        Ejecuta varias sentencias (query, params) en una única transacción
+        (BEGIN IMMEDIATE) y retorna el rowcount de cada una.
+        """
+        if self.settings.is_auto_backup_enabled():
+            self._auto_backup()
+        
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rowcounts = [conn.execute(query, params or ()).rowcount
+                         for query, params in statements]
+            conn.commit()
+            self.data_version += 1
+            return rowcounts
+    
     def execute_insert(self, query: str, params: tuple = None) -> int:
         """Ejecuta un INSERT y retorna el ID del registro insertado."""
         # Crear backup automático
         if self.settings.is_auto_backup_enabled():
-            self.create_backup("auto")
+            self._auto_backup()
         
         with self.get_connection() as conn:
+            # Tomar el lock de escritura al inicio; busy_timeout reintenta el BEGIN
+            conn.execute("BEGIN IMMEDIATE")
             cursor = conn.execute(query, params or ())
             conn.commit()
+            self.data_version += 1
             return cursor.lastrowid
 
 
 class HomologationRepository:
     """Repositorio para operaciones CRUD de homologaciones."""
     
-    def __init__(self, db_manager: DatabaseManager):
-        self.db = db_manager
-    
-    def create(self, homologation_data: Dict[str, Any]) -> int:
-        """Crea una nueva homologación."""
-        query = """
+    # Consultas fijas: el mismo objeto str en cada llamada reutiliza la
+    # sentencia preparada del cache de la conexión
+    _SQL_INSERT = """
         INSERT INTO homologations 
         (real_name, logical_name, kb_url, kb_sync, homologation_date, 
          has_previous_versions, repository_location, details, created_by, status)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
+    _SQL_GET_BY_ID = "SELECT * FROM v_homologations_with_user WHERE id = ?"
+    _SQL_DELETE = "DELETE FROM homologations WHERE id = ?"
+    
+    def __init__(self, db_manager: DatabaseManager):
+        self.db = db_manager
+    
+    def create(self, homologation_data: Dict[str, Any]) -> int:
+        """Crea una nueva homologación."""
+        query = self._SQL_INSERT
         
         params = (
             homologation_data['real_name'],
@@ -301,110 +753,98 @@ class HomologationRepository:
     
     def get_by_id(self, homologation_id: int) -> Optional[sqlite3.Row]:
         """Obtiene una homologación por ID."""
-        query = "SELECT * FROM v_homologations_with_user WHERE id = ?"
-        results = self.db.execute_query(query, (homologation_id,))
+        results = self.db.execute_query(self._SQL_GET_BY_ID, (homologation_id,))
         return results[0] if results else None
     
     def get_all(self, filters: Dict[str, Any] = None) -> List[sqlite3.Row]:
-        """Obtiene todas las homologaciones con filtros opcionales."""
-        query = "SELECT * FROM v_homologations_with_user"
-        params = []
-        where_clauses = []
+        """
+        Obtiene todas las homologaciones con filtros opcionales.
         
-        if filters:
-            if filters.get('real_name'):
-                where_clauses.append("real_name LIKE ?")
-                params.append(f"%{filters['real_name']}%")
-            
-            if filters.get('logical_name'):
-                where_clauses.append("logical_name LIKE ?")
-                params.append(f"%{filters['logical_name']}%")
-            
-            if filters.get('date_from'):
-                where_clauses.append("homologation_date >= ?")
-                params.append(filters['date_from'])
-            
-            if filters.get('date_to'):
-                where_clauses.append("homologation_date <= ?")
-                params.append(filters['date_to'])
-            
-            if filters.get('repository_location'):
-                where_clauses.append("repository_location = ?")
-                params.append(filters['repository_location'])
+        Todos los filtros (incluido 'search_term') se combinan en una única
+        consulta para que SQLite descarte las filas antes de transferirlas.
+        """
+        return self.db.execute_query(*self._build_get_all_query(filters))
+    
+    def get_all_iter(self, filters: Dict[str, Any] = None) -> Iterator[sqlite3.Row]:
+        """Itera las homologaciones con filtros opcionales sin cargarlas en memoria."""
+        return self.db.iter_query(*self._build_get_all_query(filters))
+    
+    def _build_get_all_query(self, filters: Optional[Dict[str, Any]]) -> Tuple[str, tuple]:
+        """Construye la consulta y parámetros de get_all."""
+        keys = tuple(key for key, _ in _HOMOLOGATION_FILTERS if filters and filters.get(key))
+        params = []
+        use_fts = (
+            'search_term' in keys
+            and self.db.fts_enabled
+            and len(str(filters['search_term'])) >= FTS_MIN_TERM_LENGTH
+        )
         
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
+        # Los parámetros se enlazan en el mismo orden en que se generó el SQL
+        for key in keys:
+            value = filters[key]
+            if key == 'search_term' and use_fts:
+                # Frase entre comillas: subcadena literal, sin operadores FTS
+                params.append('"' + str(value).replace('"', '""') + '"')
+            elif key == 'search_term':
+                params.extend([f"%{value}%"] * 4)
+            elif key in ('real_name', 'logical_name'):
+                params.append(f"%{value}%")
+            else:
+                params.append(value)
         
-        query += " ORDER BY created_at DESC"
+        if 'search_term' in keys:
+            params.extend([f"%{filters['search_term']}%"] * 2)
         
-        return self.db.execute_query(query, tuple(params))
+        return _homologation_query_sql(keys, use_fts), tuple(params)
     
     def update(self, homologation_id: int, update_data: Dict[str, Any]) -> bool:
         """Actualiza una homologación."""
-        # Construir query dinámicamente basado en los campos a actualizar
-        set_clauses = []
-        params = []
-        
-        updatable_fields = [
-            'real_name', 'logical_name', 'kb_url', 'kb_sync', 'homologation_date',
-            'has_previous_versions', 'repository_location', 'details', 'status'
-        ]
-        
-        for field in updatable_fields:
-            if field in update_data:
-                set_clauses.append(f"{field} = ?")
-                params.append(update_data[field])
-        
-        if not set_clauses:
+        # Solo los campos actualizables presentes, en orden fijo
+        keys = tuple(field for field in _UPDATABLE_FIELDS if field in update_data)
+        if not keys:
             return False
         
-        query = f"UPDATE homologations SET {', '.join(set_clauses)} WHERE id = ?"
-        params.append(homologation_id)
-        
-        return self.db.execute_non_query(query, tuple(params)) > 0
+        params = tuple(update_data[field] for field in keys) + (homologation_id,)
+        return self.db.execute_non_query(_homologation_update_sql(keys), params) > 0
     
     def delete(self, homologation_id: int) -> bool:
         """Elimina una homologación."""
-        query = "DELETE FROM homologations WHERE id = ?"
-        return self.db.execute_non_query(query, (homologation_id,)) > 0
+        return self.db.execute_non_query(self._SQL_DELETE, (homologation_id,)) > 0
     
     def search(self, search_term: str) -> List[sqlite3.Row]:
         """Busca homologaciones por término de búsqueda."""
-        query = """
-        SELECT * FROM v_homologations_with_user 
-        WHERE real_name LIKE ? 
-           OR logical_name LIKE ? 
-           OR details LIKE ?
-           OR kb_url LIKE ?
-        ORDER BY 
-            CASE 
-                WHEN real_name LIKE ? THEN 1
-                WHEN logical_name LIKE ? THEN 2
-                ELSE 3
-            END,
-            created_at DESC
-        """
-        
-        search_pattern = f"%{search_term}%"
-        params = (search_pattern, search_pattern, search_pattern, search_pattern,
-                 search_pattern, search_pattern)
-        
-        return self.db.execute_query(query, params)
+        return self.get_all({'search_term': search_term})
+    
+    def search_iter(self, search_term: str) -> Iterator[sqlite3.Row]:
+        """Itera los resultados de búsqueda sin cargarlos en memoria."""
+        return self.get_all_iter({'search_term': search_term})
 
 
 class UserRepository:
     """Repositorio para operaciones CRUD de usuarios."""
     
+    _SQL_INSERT = """
+        INSERT INTO users 
+        (username, password_hash, role, full_name, email, must_change_password)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """
+    _SQL_GET_BY_USERNAME = "SELECT * FROM users WHERE username = ? AND is_active = 1"
+    _SQL_GET_BY_ID = "SELECT * FROM users WHERE id = ?"
+    _SQL_UPDATE_PASSWORD = """
+        UPDATE users 
+        SET password_hash = ?, must_change_password = 0 
+        WHERE id = ?
+        """
+    _SQL_UPDATE_LAST_LOGIN = "UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?"
+    _SQL_REHASH_PASSWORD = "UPDATE users SET password_hash = ? WHERE id = ?"
+    _SQL_GET_ALL_ACTIVE = "SELECT * FROM users WHERE is_active = 1 ORDER BY username"
+    
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
     
     def create(self, user_data: Dict[str, Any]) -> int:
         """Crea un nuevo usuario."""
-        query = """
-        INSERT INTO users 
-        (username, password_hash, role, full_name, email, must_change_password)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """
+        query = self._SQL_INSERT
         
         params = (
             user_data['username'],
@@ -419,39 +859,56 @@ class UserRepository:
     
     def get_by_username(self, username: str) -> Optional[sqlite3.Row]:
         """Obtiene un usuario por nombre de usuario."""
-        query = "SELECT * FROM users WHERE username = ? AND is_active = 1"
-        results = self.db.execute_query(query, (username,))
+        results = self.db.execute_query(self._SQL_GET_BY_USERNAME, (username,))
         return results[0] if results else None
     
     def get_by_id(self, user_id: int) -> Optional[sqlite3.Row]:
         """Obtiene un usuario por ID."""
-        query = "SELECT * FROM users WHERE id = ?"
-        results = self.db.execute_query(query, (user_id,))
+        results = self.db.execute_query(self._SQL_GET_BY_ID, (user_id,))
         return results[0] if results else None
     
     def update_password(self, user_id: int, new_password_hash: str) -> bool:
         """Actualiza la contraseña de un usuario."""
-        query = """
-        UPDATE users 
-        SET password_hash = ?, must_change_password = 0 
-        WHERE id = ?
-        """
-        return self.db.execute_non_query(query, (new_password_hash, user_id)) > 0
+        return self.db.execute_non_query(self._SQL_UPDATE_PASSWORD, (new_password_hash, user_id)) > 0
     
     def update_last_login(self, user_id: int) -> bool:
         """Actualiza la fecha del último login."""
-        query = "UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?"
-        return self.db.execute_non_query(query, (user_id,)) > 0
+        return self.db.execute_non_query(self._SQL_UPDATE_LAST_LOGIN, (user_id,)) > 0
+    
+    def record_login(self, user_id: int, username: str, ip_address: str = None,
+                     new_password_hash: str = None) -> bool:
+        """
+        Actualiza el último login y registra LOGIN_SUCCESS en la auditoría
+        dentro de una sola transacción.
+        
+        Si se indica new_password_hash, reemplaza también el hash almacenado
+        (re-hash con parámetros nuevos) sin tocar must_change_password.
+        """
+        statements = [
+            (self._SQL_UPDATE_LAST_LOGIN, (user_id,)),
+            (AuditRepository._SQL_INSERT_AUDIT,
+             (user_id, "LOGIN_SUCCESS", None, None, None,
+              _encode_json({"username": username}), ip_address)),
+        ]
+        if new_password_hash:
+            statements.append((self._SQL_REHASH_PASSWORD, (new_password_hash, user_id)))
+        
+        return self.db.execute_transaction(statements)[0] > 0
     
     def get_all_active(self) -> List[sqlite3.Row]:
         """Obtiene todos los usuarios activos."""
-        query = "SELECT * FROM users WHERE is_active = 1 ORDER BY username"
-        return self.db.execute_query(query)
+        return self.db.execute_query(self._SQL_GET_ALL_ACTIVE)
 
 
 class AuditRepository:
     """Repositorio para consultas de auditoría."""
     
+    _SQL_INSERT_AUDIT = """
+        INSERT INTO audit_logs 
+        (user_id, action, table_name, record_id, old_values, new_values, ip_address)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """
+    
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
     
@@ -459,57 +916,155 @@ class AuditRepository:
                    record_id: int = None, old_values: Dict = None, 
                    new_values: Dict = None, ip_address: str = None) -> int:
         """Registra una acción en el log de auditoría."""
-        query = """
-        INSERT INTO audit_logs 
-        (user_id, action, table_name, record_id, old_values, new_values, ip_address)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """
+        query = self._SQL_INSERT_AUDIT
         
         params = (
             user_id,
             action,
             table_name,
             record_id,
-            json.dumps(old_values) if old_values else None,
-            json.dumps(new_values) if new_values else None,
+            _encode_json(old_values),
+            _encode_json(new_values),
             ip_address
         )
         
         return self.db.execute_insert(query, params)
     
-    def get_audit_trail(self, filters: Dict[str, Any] = None) -> List[sqlite3.Row]:
-        """Obtiene el trail de auditoría con filtros opcionales."""
-        query = "SELECT * FROM v_audit_with_user"
-        params = []
-        where_clauses = []
-        
-        if filters:
-            if filters.get('user_id'):
-                where_clauses.append("user_id = ?")
-                params.append(filters['user_id'])
-            
-            if filters.get('action'):
-                where_clauses.append("action = ?")
-                params.append(filters['action'])
-            
-            if filters.get('table_name'):
-                where_clauses.append("table_name = ?")
-                params.append(filters['table_name'])
-            
-            if filters.get('date_from'):
-                where_clauses.append("timestamp >= ?")
-                params.append(filters['date_from'])
-            
-            if filters.get('date_to'):
-                where_clauses.append("timestamp <= ?")
-                params.append(filters['date_to'])
+    def log_actions_bulk(self, entries) -> int:
+        """
+        Registra varias acciones en una sola transacción.
         
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
+        Cada entrada es una tupla con los argumentos de log_action en el mismo
+        orden: (user_id, action, table_name, record_id, old_values, new_values,
+        ip_address); los cinco últimos son opcionales.
+        """
+        params_seq = []
+        for entry in entries:
+            user_id, action, table_name, record_id, old_values, new_values, ip_address = (
+                tuple(entry) + (None,) * (7 - len(entry))
+            )
+            params_seq.append((
+                user_id,
+                action,
+                table_name,
+                record_id,
+                _encode_json(old_values),
+                _encode_json(new_values),
+                ip_address
+            ))
         
-        query += " ORDER BY timestamp DESC LIMIT 1000"
+        if not params_seq:
+            return 0
         
-        return self.db.execute_query(query, tuple(params))
+        return self.db.execute_many(self._SQL_INSERT_AUDIT, params_seq)
+    
+    def get_audit_trail(self, filters: Dict[str, Any] = None) -> List[sqlite3.Row]:
+        """Obtiene el trail de auditoría con filtros opcionales."""
+        return self.db.execute_query(*self._build_audit_trail_query(filters))
+    
+    def get_audit_trail_iter(self, filters: Dict[str, Any] = None) -> Iterator[sqlite3.Row]:
+        """Itera el trail de auditoría con filtros opcionales sin cargarlo en memoria."""
+        return self.db.iter_query(*self._build_audit_trail_query(filters))
+    
+    def _build_audit_trail_query(self, filters: Optional[Dict[str, Any]]) -> Tuple[str, tuple]:
+        """Construye la consulta y parámetros del trail de auditoría."""
+        keys = tuple(key for key, _ in _AUDIT_FILTERS if filters and filters.get(key))
+        return _audit_trail_query_sql(keys), tuple(filters[key] for key in keys)
+
+    # Consultas de reportes: SQL literal y fijo por método para que SQLite
+    # reutilice la sentencia preparada en lugar de re-parsearla en cada reporte.
+    _REPORT_SELECT = """
+        SELECT a.id, a.user_id, a.action, a.table_name, a.record_id,
+               a.old_values, a.new_values, u.username, u.full_name,
+               a.ip_address, a.timestamp
+        FROM audit_logs a
+        LEFT JOIN users u ON a.user_id = u.id
+    """
+
+    _SQL_ACTIONS_SINCE = _REPORT_SELECT + """
+        WHERE a.action = ? AND a.timestamp >= ?
+        ORDER BY a.timestamp DESC
+    """
+
+    _SQL_USER_ACTIVITY_SINCE = _REPORT_SELECT + """
+        WHERE a.user_id = ? AND a.timestamp >= ?
+        ORDER BY a.timestamp DESC
+    """
+
+    _SQL_TABLE_CHANGES_SINCE = _REPORT_SELECT + """
+        WHERE a.table_name = ? AND a.timestamp >= ?
+        ORDER BY a.timestamp DESC
+    """
+
+    _SQL_ACTIVITY_SINCE = _REPORT_SELECT + """
+        WHERE a.timestamp >= ?
+        ORDER BY a.timestamp DESC
+    """
+
+    _SQL_COUNT_ACTIONS_SINCE = """
+        SELECT action, COUNT(*) AS total
+        FROM audit_logs
+        WHERE action IN ('LOGIN_FAILED', 'PERMISSION_DENIED') AND timestamp >= ?
+        GROUP BY action
+    """
+
+    _SQL_FAILED_LOGINS_BY_IP = """
+        SELECT COALESCE(ip_address, 'Unknown') AS ip_address, COUNT(*) AS attempts
+        FROM audit_logs
+        WHERE action = 'LOGIN_FAILED' AND timestamp >= ?
+        GROUP BY 1
+        HAVING attempts >= ?
+        ORDER BY attempts DESC
+    """
+
+    _SQL_FAILED_LOGINS_BY_USER = """
+        SELECT COALESCE(u.username, json_extract(a.new_values, '$.username'), 'Unknown') AS username,
+               COUNT(*) AS attempts
+        FROM audit_logs a
+        LEFT JOIN users u ON a.user_id = u.id
+        WHERE a.action = 'LOGIN_FAILED' AND a.timestamp >= ?
+        GROUP BY 1
+        HAVING attempts >= ?
+        ORDER BY attempts DESC
+    """
+
+    def count_security_events_since(self, date_from: str) -> Dict[str, int]:
+        """Cuenta logins fallidos y accesos denegados desde una fecha."""
+        rows = self.db.execute_query(self._SQL_COUNT_ACTIONS_SINCE, (date_from,))
+        return {row['action']: row['total'] for row in rows}
+
+    def get_failed_logins_by_ip(self, date_from: str, min_attempts: int = 1) -> List[sqlite3.Row]:
+        """Obtiene las IPs con al menos `min_attempts` logins fallidos desde una fecha."""
+        return self.db.execute_query(self._SQL_FAILED_LOGINS_BY_IP, (date_from, min_attempts))
+
+    def get_failed_logins_by_user(self, date_from: str, min_attempts: int = 1) -> List[sqlite3.Row]:
+        """Obtiene los usuarios con al menos `min_attempts` logins fallidos desde una fecha."""
+        return self.db.execute_query(self._SQL_FAILED_LOGINS_BY_USER, (date_from, min_attempts))
+
+    def get_actions_since(self, action: str, date_from: str) -> List[sqlite3.Row]:
+        """Obtiene los eventos de una acción desde una fecha."""
+        return self.db.execute_query(self._SQL_ACTIONS_SINCE, (action, date_from))
+
+    def get_actions_in_since(self, actions: Tuple[str, ...], date_from: str) -> List[sqlite3.Row]:
+        """Obtiene en una sola consulta los eventos de varias acciones desde una fecha."""
+        placeholders = ", ".join("?" for _ in actions)
+        query = self._REPORT_SELECT + f"""
+        WHERE a.action IN ({placeholders}) AND a.timestamp >= ?
+        ORDER BY a.timestamp DESC
+        """
+        return self.db.execute_query(query, (*actions, date_from))
+
+    def get_user_activity_since(self, user_id: int, date_from: str) -> List[sqlite3.Row]:
+        """Obtiene la actividad de un usuario desde una fecha."""
+        return self.db.execute_query(self._SQL_USER_ACTIVITY_SINCE, (user_id, date_from))
+
+    def get_table_changes_since(self, table_name: str, date_from: str) -> List[sqlite3.Row]:
+        """Obtiene los cambios de una tabla desde una fecha."""
+        return self.db.execute_query(self._SQL_TABLE_CHANGES_SINCE, (table_name, date_from))
+
+    def get_activity_since(self, date_from: str) -> List[sqlite3.Row]:
+        """Obtiene toda la actividad registrada desde una fecha."""
+        return self.db.execute_query(self._SQL_ACTIVITY_SINCE, (date_from,))
 
 
 # Instancia global del administrador de base de datos
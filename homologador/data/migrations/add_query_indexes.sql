@@ -0,0 +1,8 @@
+-- Índices compuestos para los patrones de consulta de los repositorios
+-- (los índices de una sola columna ya están en schema.sql)
+
+-- Filtro por repositorio ordenado por fecha de creación (get_all)
+CREATE INDEX IF NOT EXISTS idx_homologations_repository_created ON homologations(repository_location, created_at);
+
+-- Reportes de seguridad: acción + rango de fechas
+CREATE INDEX IF NOT EXISTS idx_audit_action_timestamp ON audit_logs(action, timestamp);
@@ -0,0 +1,38 @@
+-- Índice de texto completo para la búsqueda de homologaciones.
+-- El tokenizador trigram permite buscar subcadenas (igual que LIKE '%term%')
+-- usando el índice en lugar de recorrer toda la tabla.
+CREATE VIRTUAL TABLE IF NOT EXISTS homologations_fts USING fts5(
+    real_name, logical_name, details, kb_url,
+    content='homologations', content_rowid='id',
+    tokenize='trigram'
+);
+
+-- Mantener el índice sincronizado con la tabla
+CREATE TRIGGER IF NOT EXISTS trigger_homologations_fts_insert
+    AFTER INSERT ON homologations
+BEGIN
+    INSERT INTO homologations_fts(rowid, real_name, logical_name, details, kb_url)
+    VALUES (NEW.id, NEW.real_name, NEW.logical_name, NEW.details, NEW.kb_url);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_homologations_fts_delete
+    AFTER DELETE ON homologations
+BEGIN
+    INSERT INTO homologations_fts(homologations_fts, rowid, real_name, logical_name, details, kb_url)
+    VALUES ('delete', OLD.id, OLD.real_name, OLD.logical_name, OLD.details, OLD.kb_url);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_homologations_fts_update
+    AFTER UPDATE OF real_name, logical_name, details, kb_url ON homologations
+BEGIN
+    INSERT INTO homologations_fts(homologations_fts, rowid, real_name, logical_name, details, kb_url)
+    VALUES ('delete', OLD.id, OLD.real_name, OLD.logical_name, OLD.details, OLD.kb_url);
+    INSERT INTO homologations_fts(rowid, real_name, logical_name, details, kb_url)
+    VALUES (NEW.id, NEW.real_name, NEW.logical_name, NEW.details, NEW.kb_url);
+END;
+
+-- Poblar el índice la primera vez (bases existentes con datos)
+INSERT INTO homologations_fts(homologations_fts)
+SELECT 'rebuild'
+WHERE NOT EXISTS (SELECT 1 FROM homologations_fts_docsize)
+  AND EXISTS (SELECT 1 FROM homologations);
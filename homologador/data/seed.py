@@ -3,16 +3,145 @@ Sistema de autenticación y gestión de usuarios para el Homologador.
 Maneja roles, contraseñas con Argon2 y seed de datos inicial.
 """
 
+import functools
+import hashlib
+import hmac
 import logging
-from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError, HashingError
-from typing import Optional, Dict, Any
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from importlib import metadata
+from argon2 import PasswordHasher, Type, extract_parameters
+from argon2.low_level import hash_secret_raw
+from argon2.exceptions import VerifyMismatchError, HashingError, InvalidHashError
+from typing import Optional, Dict, Any, Mapping
 from datetime import datetime
 
+from core.settings import get_settings
 from core.storage import get_user_repository, get_audit_repository
+from core.audit import get_audit_writer
 
 logger = logging.getLogger(__name__)
 
+# Límites de la calibración de memoria de Argon2 (KiB)
+ARGON2_MIN_MEMORY_KIB = 8 * 1024
+ARGON2_MAX_MEMORY_KIB = 1024 * 1024
+
+# Acciones permitidas por rol
+_PERMISSIONS = {
+    'admin': frozenset({'create', 'read', 'update', 'delete'}),
+    'editor': frozenset({'create', 'read', 'update'}),
+    'viewer': frozenset({'read'}),
+}
+_NO_PERMISSIONS = frozenset()
+
+# Cache de verificaciones recientes: segundos de validez y entradas máximas
+VERIFY_CACHE_TTL = 30
+VERIFY_CACHE_MAXSIZE = 256
+
+# Clave HMAC aleatoria por proceso: el cache guarda un digest de la
+# contraseña, nunca el texto plano
+_VERIFY_CACHE_KEY = os.urandom(32)
+
+# (hash almacenado, digest de la contraseña) -> (expira en, resultado)
+_verify_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_verify_cache_lock = threading.Lock()
+
+
+def _argon2_hash_ms(time_cost: int, memory_cost: int, parallelism: int) -> float:
+    """Mide en milisegundos un hash Argon2id con los parámetros dados."""
+    start = time.perf_counter()
+    hash_secret_raw(b"calibration", b"calibration-salt", time_cost,
+                    memory_cost, parallelism, 32, Type.ID)
+    return (time.perf_counter() - start) * 1000
+
+
+def calibrate_memory_cost(target_ms: int, time_cost: int, parallelism: int) -> int:
+    """
+    Busca el memory_cost en KiB con el que un hash Argon2id tarda
+    aproximadamente target_ms en esta máquina.
+    
+    Duplica la memoria hasta pasarse del objetivo y luego bisecta, así nunca
+    se prueba una memoria mucho mayor que la necesaria.
+    """
+    best = ARGON2_MIN_MEMORY_KIB
+    if _argon2_hash_ms(time_cost, best, parallelism) > target_ms:
+        return best
+    
+    high = best * 2
+    while high <= ARGON2_MAX_MEMORY_KIB and _argon2_hash_ms(time_cost, high, parallelism) <= target_ms:
+        best, high = high, high * 2
+    high = min(high, ARGON2_MAX_MEMORY_KIB + 1024)
+    
+    # Bisección en pasos de 1 MiB entre el último valor válido y el primero excedido
+    while high - best > 1024:
+        memory_cost = (best + high) // 2 // 1024 * 1024
+        if _argon2_hash_ms(time_cost, memory_cost, parallelism) <= target_ms:
+            best = memory_cost
+        else:
+            high = memory_cost
+    
+    return best
+
+
+def _argon2_bindings_version() -> str:
+    """Retorna la versión instalada de argon2-cffi-bindings (backend C de Argon2)."""
+    try:
+        return metadata.version("argon2-cffi-bindings")
+    except metadata.PackageNotFoundError:
+        return "desconocida"
+
+
+# Hasher compartido por todo el proceso (se crea en el primer uso)
+_password_hasher = None
+
+# Hash de una contraseña aleatoria con los mismos parámetros que los reales;
+# se verifica contra él cuando el usuario no existe. Se genera junto con el
+# hasher para que ningún login pague su costo
+_dummy_hash = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Retorna el PasswordHasher global, configurado desde core.settings."""
+    global _password_hasher, _dummy_hash
+    if _password_hasher is None:
+        settings = get_settings()
+        params = settings.get_argon2_params()
+        
+        # La calibración se hace una sola vez y queda en config.json: medir en
+        # cada inicio daría parámetros distintos (y re-hashes) en cada ejecución
+        if settings.needs_argon2_calibration():
+            target_ms = settings.get_argon2_target_ms()
+            params["memory_cost"] = calibrate_memory_cost(
+                target_ms, params["time_cost"], params["parallelism"]
+            )
+            settings.save_config_values({
+                "argon2_memory_cost_kib": params["memory_cost"],
+                "argon2_calibrated_target_ms": target_ms,
+            })
+            logger.info("Argon2 calibrado a %d KiB para ~%d ms", params["memory_cost"], target_ms)
+        
+        hasher = PasswordHasher(hash_len=32, salt_len=16, **params)
+        _dummy_hash = hasher.hash(os.urandom(16).hex())
+        _password_hasher = hasher
+        logger.debug("Argon2 (argon2-cffi-bindings %s): %s", _argon2_bindings_version(), params)
+    return _password_hasher
+
+
+@functools.cache
+def _user_repo():
+    """Repositorio de usuarios compartido por el módulo."""
+    return get_user_repository()
+
+
+@functools.cache
+def _audit_repo():
+    """Repositorio de auditoría compartido por el módulo."""
+    return get_audit_repository()
+
 
 class AuthenticationError(Exception):
     """Excepción para errores de autenticación."""
@@ -22,10 +151,13 @@ class AuthenticationError(Exception):
 class AuthService:
     """Servicio de autenticación y gestión de usuarios."""
     
+    __slots__ = ("password_hasher", "user_repo", "audit_writer", "current_user")
+    
     def __init__(self):
-        self.password_hasher = PasswordHasher()
-        self.user_repo = get_user_repository()
-        self.audit_repo = get_audit_repository()
+        self.password_hasher = get_password_hasher()
+        self.user_repo = _user_repo()
+        # Los eventos de sesión se escriben por lotes en segundo plano
+        self.audit_writer = get_audit_writer()
         self.current_user = None
     
     def hash_password(self, password: str) -> str:
@@ -33,19 +165,42 @@ class AuthService:
         try:
             return self.password_hasher.hash(password)
         except HashingError as e:
-            logger.error(f"Error hasheando contraseña: {e}")
+            logger.error("Error hasheando contraseña: %s", e)
             raise AuthenticationError("Error procesando contraseña")
     
     def verify_password(self, password: str, hashed_password: str) -> bool:
-        """Verifica si una contraseña coincide con su hash."""
+        """
+        Verifica si una contraseña coincide con su hash.
+        
+        El resultado se recuerda VERIFY_CACHE_TTL segundos para no repetir
+        Argon2 en re-autenticaciones seguidas. La clave incluye el hash
+        almacenado, así que un cambio de contraseña no reutiliza entradas.
+        """
+        digest = hmac.new(_VERIFY_CACHE_KEY, password.encode('utf-8'), hashlib.sha256).digest()
+        key = (hashed_password, digest)
+        now = time.monotonic()
+        
+        with _verify_cache_lock:
+            cached = _verify_cache.get(key)
+            if cached and cached[0] > now:
+                return cached[1]
+        
         try:
             self.password_hasher.verify(hashed_password, password)
-            return True
+            result = True
         except VerifyMismatchError:
-            return False
+            result = False
         except Exception as e:
-            logger.error(f"Error verificando contraseña: {e}")
+            logger.error("Error verificando contraseña: %s", e)
             return False
+        
+        with _verify_cache_lock:
+            _verify_cache[key] = (now + VERIFY_CACHE_TTL, result)
+            _verify_cache.move_to_end(key)
+            while len(_verify_cache) > VERIFY_CACHE_MAXSIZE:
+                _verify_cache.popitem(last=False)
+        
+        return result
     
     def authenticate(self, username: str, password: str, ip_address: str = None) -> Dict[str, Any]:
         """
@@ -58,8 +213,11 @@ class AuthService:
             # Buscar usuario
             user = self.user_repo.get_by_username(username)
             if not user:
-                logger.warning(f"Intento de login con usuario inexistente: {username}")
-                self.audit_repo.log_action(
+                # Verificar igual contra un hash ficticio, por el mismo camino
+                # (y cache) que un usuario real: el tiempo no revela si existe
+                self.verify_password(password, _dummy_hash)
+                logger.warning("Intento de login con usuario inexistente: %s", username)
+                self.audit_writer.log_action(
                     user_id=None,
                     action="LOGIN_FAILED",
                     new_values={"username": username, "reason": "user_not_found"},
@@ -69,8 +227,8 @@ class AuthService:
             
             # Verificar contraseña
             if not self.verify_password(password, user['password_hash']):
-                logger.warning(f"Contraseña incorrecta para usuario: {username}")
-                self.audit_repo.log_action(
+                logger.warning("Contraseña incorrecta para usuario: %s", username)
+                self.audit_writer.log_action(
                     user_id=user['id'],
                     action="LOGIN_FAILED",
                     new_values={"username": username, "reason": "wrong_password"},
@@ -78,21 +236,25 @@ class AuthService:
                 )
                 raise AuthenticationError("Usuario o contraseña incorrectos")
             
-            # Usuario autenticado exitosamente
-            self.current_user = dict(user)
+            # Usuario autenticado exitosamente (vista de solo lectura, sin copias posteriores)
+            self.current_user = MappingProxyType(dict(user))
             
-            # Actualizar último login
-            self.user_repo.update_last_login(user['id'])
+            # Hashes con parámetros Argon2 anteriores se regeneran ahora que se
+            # conoce la contraseña; no hace falta un re-hash masivo
+            new_hash = None
+            if self._needs_rehash(user['password_hash']):
+                new_hash = self.hash_password(password)
+                logger.info("Hash de contraseña actualizado para usuario: %s", username)
             
-            # Log de login exitoso
-            self.audit_repo.log_action(
-                user_id=user['id'],
-                action="LOGIN_SUCCESS",
-                new_values={"username": username},
-                ip_address=ip_address
-            )
+            # Si quedan eventos encolados de este usuario (p. ej. LOGIN_FAILED
+            # previos), escribirlos antes para que LOGIN_SUCCESS quede después
+            if self.audit_writer.has_pending(user['id']):
+                self.audit_writer.flush()
+            
+            # Actualizar último login y registrar el éxito en una sola transacción
+            self.user_repo.record_login(user['id'], username, ip_address, new_hash)
             
-            logger.info(f"Login exitoso para usuario: {username}")
+            logger.info("Login exitoso para usuario: %s", username)
             
             return {
                 'user_id': user['id'],
@@ -106,18 +268,18 @@ class AuthService:
         except AuthenticationError:
             raise
         except Exception as e:
-            logger.error(f"Error durante autenticación: {e}")
+            logger.error("Error durante autenticación: %s", e)
             raise AuthenticationError("Error interno durante autenticación")
     
     def logout(self, user_id: int = None, ip_address: str = None):
         """Cierra la sesión del usuario actual."""
         if self.current_user:
-            self.audit_repo.log_action(
+            self.audit_writer.log_action(
                 user_id=user_id or self.current_user['id'],
                 action="LOGOUT",
                 ip_address=ip_address
             )
-            logger.info(f"Logout para usuario: {self.current_user['username']}")
+            logger.info("Logout para usuario: %s", self.current_user['username'])
             self.current_user = None
     
     def change_password(self, user_id: int, old_password: str, new_password: str, 
@@ -145,14 +307,14 @@ class AuthService:
             
             if success:
                 # Log de cambio de contraseña
-                self.audit_repo.log_action(
+                self.audit_writer.log_action(
                     user_id=user_id,
                     action="PASSWORD_CHANGED",
                     new_values={"forced": user['must_change_password']},
                     ip_address=ip_address
                 )
                 
-                logger.info(f"Contraseña cambiada para usuario ID: {user_id}")
+                logger.info("Contraseña cambiada para usuario ID: %s", user_id)
                 return True
             else:
                 raise AuthenticationError("Error actualizando contraseña")
@@ -160,9 +322,24 @@ class AuthService:
         except AuthenticationError:
             raise
         except Exception as e:
-            logger.error(f"Error cambiando contraseña: {e}")
+            logger.error("Error cambiando contraseña: %s", e)
             raise AuthenticationError("Error interno cambiando contraseña")
     
+    def _needs_rehash(self, hashed_password: str) -> bool:
+        """
+        Retorna si un hash almacenado es más débil que los parámetros actuales.
+        
+        Solo cuentan time_cost y memory_cost por debajo del objetivo; otras
+        diferencias (p. ej. parallelism) no provocan re-hash, así dos equipos
+        con configuraciones distintas no reescriben el hash en cada login.
+        """
+        try:
+            stored = extract_parameters(hashed_password)
+        except InvalidHashError:
+            return False
+        return (stored.time_cost < self.password_hasher.time_cost
+                or stored.memory_cost < self.password_hasher.memory_cost)
+    
     def _validate_password_strength(self, password: str):
         """Valida la fortaleza de una contraseña."""
         if len(password) < 6:
@@ -200,7 +377,7 @@ class AuthService:
             
             # Log de creación de usuario
             if creator_id:
-                self.audit_repo.log_action(
+                self.audit_writer.log_action(
                     user_id=creator_id,
                     action="USER_CREATED",
                     table_name="users",
@@ -212,11 +389,11 @@ class AuthService:
                     }
                 )
             
-            logger.info(f"Usuario creado: {username} (ID: {user_id})")
+            logger.info("Usuario creado: %s (ID: %s)", username, user_id)
             return user_id
             
         except Exception as e:
-            logger.error(f"Error creando usuario: {e}")
+            logger.error("Error creando usuario: %s", e)
             raise AuthenticationError(f"Error creando usuario: {e}")
     
     def has_permission(self, action: str, role: str = None) -> bool:
@@ -233,17 +410,14 @@ class AuthService:
         if not role:
             return False
         
-        permissions = {
-            'admin': ['create', 'read', 'update', 'delete'],
-            'editor': ['create', 'read', 'update'],
-            'viewer': ['read']
-        }
-        
-        return action in permissions.get(role, [])
+        return action in _PERMISSIONS.get(role, _NO_PERMISSIONS)
     
-    def get_current_user(self) -> Optional[Dict[str, Any]]:
-        """Retorna información del usuario actualmente autenticado."""
-        return self.current_user.copy() if self.current_user else None
+    def get_current_user(self) -> Optional[Mapping[str, Any]]:
+        """
+        Retorna información del usuario actualmente autenticado como vista de
+        solo lectura; quien necesite modificarla debe copiarla con dict(...).
+        """
+        return self.current_user
     
     def is_authenticated(self) -> bool:
         """Verifica si hay un usuario autenticado."""
@@ -253,9 +427,8 @@ class AuthService:
 def create_seed_data():
     """Crea los datos iniciales (seed) para la aplicación."""
     try:
-        auth_service = AuthService()
-        user_repo = get_user_repository()
-        audit_repo = get_audit_repository()
+        user_repo = _user_repo()
+        audit_repo = _audit_repo()
         
         # Verificar si ya existe el usuario admin
         existing_admin = user_repo.get_by_username('admin')
@@ -266,7 +439,7 @@ def create_seed_data():
         # Crear usuario administrador por defecto
         admin_user_data = {
             'username': 'admin',
-            'password_hash': auth_service.hash_password('admin123'),
+            'password_hash': get_password_hasher().hash('admin123'),
             'role': 'admin',
             'full_name': 'Administrador del Sistema',
             'email': 'admin@empresa.com',
@@ -285,17 +458,12 @@ def create_seed_data():
             }
         )
         
-        logger.info(f"Seed data creado exitosamente. Usuario admin ID: {admin_id}")
-        print("=" * 50)
-        print("DATOS INICIALES CREADOS")
-        print("=" * 50)
-        print("Usuario: admin")
-        print("Contraseña: admin123")
-        print("¡IMPORTANTE: Cambie la contraseña en el primer login!")
-        print("=" * 50)
+        logger.info("Seed data creado exitosamente. Usuario admin ID: %s", admin_id)
+        logger.info("Usuario inicial: admin / admin123. "
+                    "¡IMPORTANTE: Cambie la contraseña en el primer login!")
         
     except Exception as e:
-        logger.error(f"Error creando seed data: {e}")
+        logger.error("Error creando seed data: %s", e)
         raise
 
 
@@ -310,8 +478,8 @@ def get_auth_service() -> AuthService:
     return _auth_service
 
 
-if __name__ == "__main__":
-    # Test del sistema de autenticación
+if __name__ == "__main__" and "--demo" in sys.argv:
+    # Demo del sistema de autenticación (python -m data.seed --demo)
     from core.settings import setup_logging
     
     setup_logging()
@@ -344,4 +512,4 @@ if __name__ == "__main__":
         
     except Exception as e:
         print(f"Error en test: {e}")
-        logger.error(f"Error en test: {e}")
\ No newline at end of file
+        logger.error("Error en test: %s", e)
\ No newline at end of file
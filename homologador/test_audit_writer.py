@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas del escritor de auditoría en segundo plano.
+Ejecutar con: pytest test_audit_writer.py
+"""
+
+import json
+import threading
+
+import pytest
+
+import core.audit as audit
+from core.audit import AuditWriter
+from data.seed import AuthenticationError
+
+
+def _actions(db, action):
+    """Filas de auditoría de una acción, en orden de inserción."""
+    return db.execute_query(
+        "SELECT * FROM audit_logs WHERE action = ? ORDER BY id", (action,)
+    )
+
+
+def test_log_action_encola_y_flush_escribe(db):
+    """Los eventos encolados quedan en la BD tras flush(), en orden."""
+    writer = AuditWriter()
+    for i in range(5):
+        writer.log_action(user_id=1, action="TEST_QUEUE", record_id=i,
+                          new_values={"n": i})
+    writer.flush()
+    
+    rows = _actions(db, "TEST_QUEUE")
+    assert [row['record_id'] for row in rows] == [0, 1, 2, 3, 4]
+    assert json.loads(rows[0]['new_values']) == {"n": 0}
+
+
+def test_flush_sin_hilo_escribe_en_linea(db):
+    """Sin hilo escritor, flush() vuelca la cola en el hilo que llama."""
+    writer = AuditWriter()
+    writer._queue.put((1, "TEST_INLINE"))
+    writer.flush()
+    
+    assert writer._thread is None
+    assert len(_actions(db, "TEST_INLINE")) == 1
+
+
+def test_flush_sin_hilo_vacia_toda_la_cola(db):
+    """El vaciado en línea escribe más de un lote (AUDIT_BATCH_SIZE)."""
+    writer = AuditWriter()
+    total = audit.AUDIT_BATCH_SIZE * 2 + 1
+    for i in range(total):
+        writer._queue.put((1, "TEST_INLINE_MANY", None, i))
+    writer.flush()
+    
+    assert writer._queue.empty()
+    assert len(_actions(db, "TEST_INLINE_MANY")) == total
+
+
+def test_has_pending_por_usuario(db):
+    """has_pending solo es verdadero mientras queden eventos del usuario."""
+    writer = AuditWriter()
+    # Hilo sin arrancar: los eventos quedan en cola hasta flush()
+    writer._thread = threading.Thread(target=lambda: None)
+    writer.log_action(user_id=1, action="TEST_PENDING")
+    
+    assert writer.has_pending(1)
+    assert not writer.has_pending(2)
+    writer.flush()
+    assert not writer.has_pending(1)
+
+
+def test_log_actions_bulk_completa_campos(db, audit_repo):
+    """log_actions_bulk acepta tuplas cortas y completa con None."""
+    written = audit_repo.log_actions_bulk([
+        (1, "TEST_BULK"),
+        (1, "TEST_BULK", "homologations", 7, {"a": 1}, {"a": 2}, "127.0.0.1"),
+    ])
+    
+    assert written == 2
+    short, full = _actions(db, "TEST_BULK")
+    assert short['table_name'] is None and short['ip_address'] is None
+    assert full['record_id'] == 7
+    assert json.loads(full['old_values']) == {"a": 1}
+    assert full['ip_address'] == '127.0.0.1'
+    assert audit_repo.log_actions_bulk([]) == 0
+
+
+def test_lote_fallido_se_reintenta(db, monkeypatch):
+    """Un error transitorio de la BD no pierde el lote."""
+    monkeypatch.setattr(audit, "AUDIT_RETRY_DELAY_S", 0)
+    writer = AuditWriter()
+    real_bulk = writer.audit_repo.log_actions_bulk
+    calls = []
+    
+    def flaky_bulk(entries):
+        calls.append(len(entries))
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return real_bulk(entries)
+    
+    monkeypatch.setattr(writer.audit_repo, "log_actions_bulk", flaky_bulk)
+    writer.log_action(user_id=1, action="TEST_RETRY")
+    writer.flush()
+    
+    assert len(calls) == 2
+    assert len(_actions(db, "TEST_RETRY")) == 1
+
+
+def test_login_exitoso_despues_de_fallidos(db, auth):
+    """LOGIN_SUCCESS queda después de los LOGIN_FAILED encolados antes."""
+    with pytest.raises(AuthenticationError):
+        auth.authenticate('admin', 'incorrecta')
+    auth.authenticate('admin', 'admin123')
+    
+    last_two = db.execute_query(
+        "SELECT action FROM audit_logs WHERE action LIKE 'LOGIN_%' ORDER BY id DESC LIMIT 2"
+    )
+    assert [row['action'] for row in last_two] == ["LOGIN_SUCCESS", "LOGIN_FAILED"]
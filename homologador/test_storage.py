@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de la serialización JSON de auditoría en core.storage.
+Ejecutar con: pytest test_storage.py
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+import core.storage as storage
+
+VALUES = {
+    "nombre": "Aplicación ñandú",
+    "activo": True,
+    "version": 2,
+    "ratio": 0.5,
+    "vacio": None,
+    "lista": [1, "dos"],
+    "fecha": date(2026, 1, 31),
+    "momento": datetime(2026, 1, 31, 8, 30, 15),
+    "monto": Decimal("10.50"),
+    3: "clave numérica",
+}
+
+EXPECTED = (
+    '{"nombre":"Aplicación ñandú","activo":true,"version":2,"ratio":0.5,'
+    '"vacio":null,"lista":[1,"dos"],"fecha":"2026-01-31",'
+    '"momento":"2026-01-31T08:30:15","monto":"10.50","3":"clave numérica"}'
+)
+
+
+def test_dumps_sin_orjson(monkeypatch):
+    """La alternativa con json produce JSON compacto sin escapar no-ASCII."""
+    monkeypatch.setattr(storage, "orjson", None)
+    assert storage._dumps(VALUES) == EXPECTED
+
+
+def test_dumps_con_orjson():
+    """orjson produce exactamente el mismo texto que la alternativa."""
+    if storage.orjson is None:
+        pytest.skip("orjson no está instalado")
+    assert storage._dumps(VALUES) == EXPECTED
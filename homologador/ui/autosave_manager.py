@@ -3,13 +3,122 @@ Gestión de autoguardado para formularios de homologación.
 Guarda borradores automáticos periódicamente para evitar pérdida de datos.
 """
 
+import hashlib
 import json
 import logging
+import os
+import re
+import sys
 import tempfile
 from pathlib import Path
-from datetime import datetime
 
-from PyQt6.QtCore import QTimer
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+# orjson serializa directamente a bytes; json queda como alternativa
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Cantidad de borradores que se conservan por formulario (archivos rotativos)
+DRAFT_SLOTS = 5
+
+# Borradores del formato anterior: draft_<id>_<AAAAMMDDHHMMSS>.json
+_LEGACY_DRAFT_RE = re.compile(r"^draft_.+_\d{14}\.json$")
+
+# Directorios ya limpiados de borradores antiguos en este proceso
+_LEGACY_CLEANED_DIRS = set()
+
+# Flags para escribir un borrador (O_BINARY evita la conversión de saltos de línea en Windows)
+_DRAFT_OPEN_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+
+def _serialize_draft(form_data) -> bytes:
+    """Serializa los datos del formulario a JSON UTF-8 indentado."""
+    if orjson:
+        return orjson.dumps(form_data, option=orjson.OPT_INDENT_2)
+    return json.dumps(form_data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def _write_draft_file(path: Path, payload: bytes):
+    """
+    Escribe el borrador con una sola llamada a write() sobre el descriptor.
+    Sin fsync: es un autoguardado y el guardado real va a la base de datos.
+    """
+    fd = os.open(path, _DRAFT_OPEN_FLAGS, 0o600)
+    try:
+        view = memoryview(payload)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
+
+def _remove_legacy_drafts(drafts_dir: Path):
+    """
+    Elimina una vez por proceso los borradores con marca de tiempo del formato
+    anterior al anillo de slots; ya nadie los rota ni los limpia.
+    """
+    if drafts_dir in _LEGACY_CLEANED_DIRS:
+        return
+    _LEGACY_CLEANED_DIRS.add(drafts_dir)
+    
+    try:
+        with os.scandir(drafts_dir) as entries:
+            legacy = [e.path for e in entries if _LEGACY_DRAFT_RE.match(e.name)]
+    except OSError as e:
+        logging.error(f"Error al listar borradores: {e}")
+        return
+    
+    for path in legacy:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logging.error(f"Error al eliminar borrador antiguo {path}: {e}")
+
+
+def _drafts_base_dir() -> Path:
+    """
+    Carpeta base para los borradores: en Linux el directorio de runtime del
+    usuario (tmpfs, en RAM) si existe y es escribible; si no, el temporal del sistema.
+    """
+    if sys.platform.startswith("linux"):
+        runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}"
+        if os.path.isdir(runtime_dir) and os.access(runtime_dir, os.W_OK | os.X_OK):
+            return Path(runtime_dir)
+    return Path(tempfile.gettempdir())
+
+
+class _DraftJobSignals(QObject):
+    """Señales de los trabajos de autoguardado (QRunnable no es un QObject)."""
+    
+    # Hash del borrador escrito y slot del anillo que ocupó
+    saved = pyqtSignal(bytes, int)
+
+
+class _DraftSaveJob(QRunnable):
+    """Escribe un borrador ya serializado fuera del hilo de la interfaz."""
+    
+    def __init__(self, payload: bytes, draft_hash: bytes, slot: int,
+                 tmp_path: Path, draft_path: Path, signals: _DraftJobSignals):
+        super().__init__()
+        self.payload = payload
+        self.draft_hash = draft_hash
+        self.slot = slot
+        self.tmp_path = tmp_path
+        self.draft_path = draft_path
+        self.signals = signals
+    
+    def run(self):
+        try:
+            # Escribir a un temporal y reemplazar de forma atómica
+            _write_draft_file(self.tmp_path, self.payload)
+            os.replace(self.tmp_path, self.draft_path)
+            self.signals.saved.emit(self.draft_hash, self.slot)
+        except Exception as e:
+            logging.error(f"Error al guardar borrador: {e}")
+
 
 class AutoSaveManager:
     """Gestiona el autoguardado de los datos del formulario."""
@@ -26,8 +135,18 @@ class AutoSaveManager:
         self.autosave_timer.timeout.connect(self.auto_save)
         
         # Crear directorio para borradores si no existe
-        self.drafts_dir = Path(tempfile.gettempdir()) / "homologador_drafts"
+        self.drafts_dir = _drafts_base_dir() / "homologador_drafts"
         self.drafts_dir.mkdir(exist_ok=True)
+        _remove_legacy_drafts(self.drafts_dir)
+        
+        # Próximo archivo del anillo draft_<id>_<slot>.json a sobrescribir
+        self._slot = 0
+        # Hash del último borrador escrito, para no repetir guardados idénticos
+        self._last_hash = None
+        
+        # La escritura corre en el pool global; el aviso vuelve al hilo de la UI
+        self._job_signals = _DraftJobSignals()
+        self._job_signals.saved.connect(self._on_draft_saved)
     
     def start(self):
         """Inicia el temporizador de autoguardado."""
@@ -50,49 +169,58 @@ class AutoSaveManager:
         try:
             # Obtener datos actuales
             form_data = self.form_dialog.get_form_data()
+            payload = _serialize_draft(form_data)
             
-            # Generar nombre de archivo para el borrador
-            draft_id = self.form_dialog.homologation_data.get('id', 'new')
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            filename = f"draft_{draft_id}_{timestamp}.json"
-            draft_path = self.drafts_dir / filename
-            
-            # Guardar borrador
-            with open(draft_path, 'w', encoding='utf-8') as f:
-                json.dump(form_data, f, ensure_ascii=False, indent=2)
+            # Sin cambios desde el último borrador: no escribir
+            draft_hash = hashlib.blake2b(payload, digest_size=16).digest()
+            if draft_hash == self._last_hash:
+                return
             
-            # Limpiar borradores antiguos (mantener solo los 5 más recientes)
-            self._cleanup_old_drafts(draft_id)
+            # Los borradores rotan sobre DRAFT_SLOTS archivos fijos: cada
+            # guardado reemplaza el más antiguo y no hace falta limpiar
+            draft_id = self.form_dialog.homologation_data.get('id', 'new')
+            draft_path = self.drafts_dir / f"draft_{draft_id}_{self._slot}.json"
+            tmp_path = self.drafts_dir / f"draft_{draft_id}_{self._slot}.tmp"
             
-            # Mostrar información de autoguardado
-            self.form_dialog.status_label.setText("Borrador guardado automáticamente")
-            QTimer.singleShot(3000, lambda: self.form_dialog.status_label.clear())
+            # En el hilo de la UI solo se toma la instantánea; el disco en el pool.
+            # Hash y slot se actualizan en _on_draft_saved, solo si la escritura
+            # tuvo éxito: un fallo se reintenta en el próximo ciclo
+            QThreadPool.globalInstance().start(
+                _DraftSaveJob(payload, draft_hash, self._slot, tmp_path, draft_path, self._job_signals)
+            )
             
         except Exception as e:
             logging.error(f"Error al guardar borrador: {e}")
     
-    def _cleanup_old_drafts(self, draft_id):
-        """Limpia borradores antiguos, manteniendo solo los más recientes."""
-        pattern = f"draft_{draft_id}_*.json"
-        drafts = sorted(self.drafts_dir.glob(pattern), key=lambda p: p.stat().st_mtime, reverse=True)
-        
-        # Mantener solo los 5 más recientes
-        for old_draft in drafts[5:]:
-            try:
-                old_draft.unlink()
-            except Exception as e:
-                logging.error(f"Error al eliminar borrador antiguo {old_draft}: {e}")
+    def _on_draft_saved(self, draft_hash: bytes, slot: int):
+        """Registra el borrador escrito y muestra el aviso (se ejecuta en el hilo de la UI)."""
+        self._last_hash = draft_hash
+        self._slot = (slot + 1) % DRAFT_SLOTS
+        try:
+            self.form_dialog.status_label.setText("Borrador guardado automáticamente")
+            QTimer.singleShot(3000, lambda: self.form_dialog.status_label.clear())
+        except RuntimeError:
+            # El diálogo ya se cerró antes de terminar la escritura
+            pass
     
     def get_latest_draft(self, draft_id="new"):
         """Recupera el borrador más reciente para el ID especificado."""
-        pattern = f"draft_{draft_id}_*.json"
-        drafts = sorted(self.drafts_dir.glob(pattern), key=lambda p: p.stat().st_mtime, reverse=True)
+        # Solo los archivos del anillo de slots de este formulario
+        slot_names = {f"draft_{draft_id}_{slot}.json" for slot in range(DRAFT_SLOTS)}
+        try:
+            # Una sola pasada por el directorio; DirEntry.stat() reutiliza los datos de readdir
+            with os.scandir(self.drafts_dir) as entries:
+                drafts = [e for e in entries if e.name in slot_names]
+            latest = max(drafts, key=lambda e: e.stat().st_mtime, default=None)
+        except OSError as e:
+            logging.error(f"Error al listar borradores: {e}")
+            return None
         
-        if not drafts:
+        if latest is None:
             return None
         
         try:
-            with open(drafts[0], 'r', encoding='utf-8') as f:
+            with open(latest.path, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except Exception as e:
             logging.error(f"Error al cargar borrador: {e}")
@@ -11,11 +11,40 @@ import sqlite3
 
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QPushButton,
-    QFrame, QScrollArea, QProgressBar, QGraphicsDropShadowEffect
+    QFrame, QScrollArea, QProgressBar
+)
+from PyQt6.QtCore import (
+    Qt, QTimer, pyqtSignal, QPropertyAnimation, QEasingCurve, QRect, QPoint,
+    QObject, QRunnable, QThreadPool
 )
-from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QPropertyAnimation, QEasingCurve, QRect
 from PyQt6.QtGui import QFont, QPainter, QColor, QPen, QBrush, QLinearGradient, QPixmap, QIcon
 
+# Contadores del dashboard con agregación condicional (una sola consulta)
+_METRICS_SUMMARY_SQL = """
+    SELECT
+        COUNT(*),
+        SUM(CASE WHEN status = 'Aprobada' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN status = 'Pendiente' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN status = 'Rechazada' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN created_at >= ? THEN 1 ELSE 0 END),
+        SUM(CASE WHEN repository_location = 'APPS$'
+                   OR UPPER(real_name) LIKE '%APPS%'
+                   OR UPPER(logical_name) LIKE '%APPS%' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN repository_location = 'AESA'
+                   OR UPPER(real_name) LIKE '%AESA%'
+                   OR UPPER(logical_name) LIKE '%AESA%' THEN 1 ELSE 0 END)
+    FROM homologations
+"""
+
+
+# Ajustes de la conexión persistente del dashboard (una sola vez al abrirla)
+_DASHBOARD_PRAGMAS = """
+    PRAGMA journal_mode = WAL;
+    PRAGMA synchronous = NORMAL;
+    PRAGMA cache_size = -8000;
+"""
+
+
 class MetricCard(QFrame):
     """Tarjeta elegante para mostrar métricas individuales."""
     
@@ -85,50 +114,51 @@ class MetricCard(QFrame):
             """)
             layout.addWidget(subtitle_label)
         
-        # Estilo de la tarjeta
+        # Estilo de la tarjeta; la sombra es un borde inferior oscuro en el
+        # stylesheet (QGraphicsDropShadowEffect re-renderiza fuera de pantalla en cada repintado)
         self.setStyleSheet(f"""
             MetricCard {{
                 background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
                     stop:0 #2a2a2a, stop:1 #1f1f1f);
                 border: 1px solid #3a3a3a;
+                border-bottom: 3px solid #141414;
                 border-radius: 12px;
             }}
             MetricCard:hover {{
                 background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
                     stop:0 #3a3a3a, stop:1 #2f2f2f);
                 border: 1px solid {self.color};
+                border-bottom: 3px solid #141414;
             }}
         """)
-        
-        # Sombra
-        shadow = QGraphicsDropShadowEffect()
-        shadow.setBlurRadius(15)
-        shadow.setColor(QColor(0, 0, 0, 30))
-        shadow.setOffset(0, 3)
-        self.setGraphicsEffect(shadow)
     
     def setup_animation(self):
         """Configura animación de hover."""
-        self.animation = QPropertyAnimation(self, b"geometry")
+        # Animar solo la posición: no invalida el layout como geometry
+        self.animation = QPropertyAnimation(self, b"pos")
         self.animation.setDuration(200)
         self.animation.setEasingCurve(QEasingCurve.Type.OutCubic)
-        
+        # Posición de reposo asignada por el layout
+        self._base_pos: Optional[QPoint] = None
+    
     def enterEvent(self, event):
         """Animación al pasar el mouse."""
-        current = self.geometry()
-        new_rect = QRect(current.x(), current.y() - 2, current.width(), current.height())
-        self.animation.setStartValue(current)
-        self.animation.setEndValue(new_rect)
+        # Tomar la posición de reposo solo si no hay una animación en curso
+        if self._base_pos is None or self.animation.state() != QPropertyAnimation.State.Running:
+            self._base_pos = self.pos()
+        self.animation.stop()
+        self.animation.setStartValue(self.pos())
+        self.animation.setEndValue(self._base_pos - QPoint(0, 2))
         self.animation.start()
         super().enterEvent(event)
-        
+    
     def leaveEvent(self, event):
         """Animación al salir el mouse."""
-        current = self.geometry()
-        new_rect = QRect(current.x(), current.y() + 2, current.width(), current.height())
-        self.animation.setStartValue(current)
-        self.animation.setEndValue(new_rect)
-        self.animation.start()
+        if self._base_pos is not None:
+            self.animation.stop()
+            self.animation.setStartValue(self.pos())
+            self.animation.setEndValue(self._base_pos)
+            self.animation.start()
         super().leaveEvent(event)
     
     def mousePressEvent(self, event):
@@ -310,12 +340,45 @@ class ChartWidget(QWidget):
         self.update()
 
 
+class _MetricsJobSignals(QObject):
+    """Señales del trabajo de métricas (QRunnable no es un QObject)."""
+    
+    finished = pyqtSignal(dict)
+
+
+class MetricsWorker(QRunnable):
+    """Consulta las métricas del dashboard fuera del hilo de la interfaz."""
+    
+    def __init__(self, fetch_metrics, signals: _MetricsJobSignals):
+        super().__init__()
+        self.fetch_metrics = fetch_metrics
+        self.signals = signals
+    
+    def run(self):
+        try:
+            metrics = self.fetch_metrics()
+        except Exception as e:
+            print(f"Error obteniendo métricas: {e}")
+            metrics = {}
+        # Emitir siempre para liberar el refresco en curso
+        self.signals.finished.emit(metrics)
+
+
 class DashboardWidget(QWidget):
     """Widget principal del dashboard con todas las métricas."""
     
     def __init__(self, db_path: str = "homologaciones.db"):
         super().__init__()
         self.db_path = db_path
+        # Conexión reutilizada entre refrescos (se abre en el primer uso)
+        self._conn: Optional[sqlite3.Connection] = None
+        # Las consultas corren en un pool propio de un hilo (así el cierre solo
+        # espera al refresco, no a otros trabajos); el resultado vuelve al hilo de la UI
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._refresh_in_flight = False
+        self._metrics_signals = _MetricsJobSignals()
+        self._metrics_signals.finished.connect(self._on_metrics_ready)
         self.metrics_cards = {}
         self.charts = {}
         self.setup_ui()
@@ -537,11 +600,20 @@ class DashboardWidget(QWidget):
         self.timer.start(30000)  # Actualizar cada 30 segundos
     
     def load_data(self):
-        """Carga todos los datos del dashboard."""
+        """Lanza la carga de métricas en segundo plano."""
+        # Si el refresco anterior no terminó, saltar este ciclo
+        if self._refresh_in_flight:
+            return
+        
+        self._refresh_in_flight = True
+        self._pool.start(
+            MetricsWorker(self.get_database_metrics, self._metrics_signals)
+        )
+    
+    def _on_metrics_ready(self, metrics: Dict[str, Any]):
+        """Actualiza el dashboard con las métricas (se ejecuta en el hilo de la UI)."""
+        self._refresh_in_flight = False
         try:
-            # Obtener métricas de la base de datos
-            metrics = self.get_database_metrics()
-            
             # Actualizar tarjetas
             self.update_metric_cards(metrics)
             
@@ -551,9 +623,40 @@ class DashboardWidget(QWidget):
             # Actualizar información del sistema
             self.update_system_info()
             
+        except RuntimeError:
+            # El widget ya se destruyó antes de terminar la consulta
+            pass
         except Exception as e:
             print(f"Error cargando datos del dashboard: {e}")
     
+    def _get_connection(self) -> sqlite3.Connection:
+        """Retorna la conexión persistente del dashboard, abriéndola si hace falta."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.executescript(_DASHBOARD_PRAGMAS)
+            self._conn = conn
+        return self._conn
+    
+    def close_connection(self):
+        """Cierra la conexión persistente del dashboard."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def shutdown(self):
+        """
+        Detiene el refresco automático y cierra la conexión. Lo llama la
+        ventana principal al cerrarse (el dashboard va embebido y no recibe
+        closeEvent); antes espera a que termine un refresco en curso.
+        """
+        self.timer.stop()
+        if not self._pool.waitForDone(5000):
+            # Consulta demasiado lenta: abortarla y esperar a que el worker termine
+            if self._conn is not None:
+                self._conn.interrupt()
+            self._pool.waitForDone()
+        self.close_connection()
+    
     def get_database_metrics(self) -> Dict[str, Any]:
         """Obtiene métricas de la base de datos."""
         metrics = {
@@ -570,51 +673,20 @@ class DashboardWidget(QWidget):
         }
         
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Total de homologaciones
-            cursor.execute("SELECT COUNT(*) FROM homologations")
-            metrics['total'] = cursor.fetchone()[0]
-            
-            # Contadores por estado usando el campo status
-            cursor.execute("SELECT COUNT(*) FROM homologations WHERE status = 'Aprobada'")
-            approved_count = cursor.fetchone()[0]
-            metrics['approved'] = approved_count
-            
-            cursor.execute("SELECT COUNT(*) FROM homologations WHERE status = 'Pendiente'")
-            pending_count = cursor.fetchone()[0]
-            metrics['pending'] = pending_count
-            
-            cursor.execute("SELECT COUNT(*) FROM homologations WHERE status = 'Rechazada'")
-            rejected_count = cursor.fetchone()[0]
-            metrics['rejected'] = rejected_count
-            
-            # APPS% - buscar en repository_location, real_name o logical_name
-            cursor.execute("""
-                SELECT COUNT(*) FROM homologations 
-                WHERE repository_location = 'APPS$' 
-                OR UPPER(real_name) LIKE '%APPS%' 
-                OR UPPER(logical_name) LIKE '%APPS%'
-            """)
-            apps_count = cursor.fetchone()[0]
-            metrics['apps_percent'] = apps_count
-            
-            # AESA - buscar en repository_location, real_name o logical_name
-            cursor.execute("""
-                SELECT COUNT(*) FROM homologations 
-                WHERE repository_location = 'AESA' 
-                OR UPPER(real_name) LIKE '%AESA%' 
-                OR UPPER(logical_name) LIKE '%AESA%'
-            """)
-            aesa_count = cursor.fetchone()[0]
-            metrics['aesa'] = aesa_count
-            
-            # Este mes
+            try:
+                cursor = self._get_connection().cursor()
+            except sqlite3.ProgrammingError:
+                # La conexión se cerró por fuera: abrir una nueva
+                self._conn = None
+                cursor = self._get_connection().cursor()
+            
+            # Totales, estados, APPS%, AESA y este mes en un único recorrido de la tabla
             first_day = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-            cursor.execute("SELECT COUNT(*) FROM homologations WHERE created_at >= ?", (first_day,))
-            result = cursor.fetchone()
-            metrics['this_month'] = result[0] if result else 0
+            cursor.execute(_METRICS_SUMMARY_SQL, (first_day,))
+            (metrics['total'], metrics['approved'], metrics['pending'], metrics['rejected'],
+             metrics['this_month'], metrics['apps_percent'], metrics['aesa']) = (
+                value or 0 for value in cursor.fetchone()
+            )
             
             # Datos mensuales para gráfico
             cursor.execute("""
@@ -638,8 +710,6 @@ class DashboardWidget(QWidget):
                 'Rechazadas': metrics['rejected']
             }
             
-            conn.close()
-            
         except sqlite3.Error as e:
             print(f"Error de base de datos: {e}")
         except Exception as e:
@@ -40,7 +40,7 @@ class AuditLoadWorker(QThread):
                 'table_name': 'homologations',
                 'record_id': self.homologation_id
             }
-            results = self.audit_repo.get_audit_trail(filters)
+            results = self.audit_repo.get_audit_trail_iter(filters)
             self.audit_loaded.emit([dict(row) for row in results])
             
         except Exception as e:
@@ -21,6 +21,7 @@ from PyQt6.QtCore import Qt, QDate, pyqtSignal, QThread, pyqtSlot, QTimer
 from PyQt6.QtGui import QAction, QIcon, QFont
 
 from core.storage import get_homologation_repository, get_audit_repository, get_database_manager
+from core.export import with_progress
 from data.seed import get_auth_service
 from .theme import (
     set_widget_style_class, toggle_theme, apply_theme_from_settings, 
@@ -54,6 +55,63 @@ class DataLoadWorker(QThread):
             self.error.emit(str(e))
 
 
+def write_records_csv(records: List[Dict[str, Any]], filename: str, progress_cb=None) -> int:
+    """Escribe los registros de la tabla en un CSV y retorna cuántos se escribieron."""
+    count = 0
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        
+        # Escribir encabezados
+        writer.writerow([
+            'ID', 'Nombre Real', 'Nombre Lógico', 'URL Documentación',
+            'KB SYNC', 'Fecha Homologación', 'Versiones Previas', 
+            'Repositorio', 'Detalles', 'Creado Por', 'Creado', 'Actualizado'
+        ])
+        
+        # Escribir datos (progreso cada EXPORT_PROGRESS_INTERVAL filas, como en core.export)
+        if progress_cb:
+            records = with_progress(records, progress_cb)
+        for row in records:
+            writer.writerow([
+                row['id'], 
+                row['real_name'], 
+                row.get('logical_name', ''),
+                row.get('kb_url', ''),
+                'Sí' if row.get('kb_sync') else 'No',
+                row.get('homologation_date', ''),
+                'Sí' if row.get('has_previous_versions') else 'No',
+                row.get('repository_location', ''),
+                row.get('details', '').replace('\n', ' ').replace('\r', ''),
+                row.get('created_by_username', ''),
+                row.get('created_at', ''),
+                row.get('updated_at', '')
+            ])
+            count += 1
+    
+    return count
+
+
+class ExportWorker(QThread):
+    """Worker thread para exportar datos sin bloquear la UI."""
+    
+    progress = pyqtSignal(int)
+    export_done = pyqtSignal(str, int)
+    error = pyqtSignal(str)
+    
+    def __init__(self, export_func, filename):
+        super().__init__()
+        self.export_func = export_func
+        self.filename = filename
+    
+    def run(self):
+        try:
+            count = self.export_func(self.filename, progress_cb=self.progress.emit)
+            self.export_done.emit(self.filename, count)
+        except Exception as e:
+            logger.error(f"Error exportando datos: {e}")
+            self.error.emit(str(e))
+
+
 class HomologationTableWidget(QTableWidget):
     """Widget personalizado para la tabla de homologaciones con soporte para paginación."""
     
@@ -650,6 +708,7 @@ class MainWindow(QMainWindow):
         self.repo = get_homologation_repository()
         self.audit_repo = get_audit_repository()
         self.data_worker = None
+        self.export_worker = None
         self.current_filters = {}
         
         # Aplicar tema desde configuraciones guardadas
@@ -1240,40 +1299,36 @@ class MainWindow(QMainWindow):
             
         if not filename.endswith('.csv'):
             filename += '.csv'
-            
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                
-                # Escribir encabezados
-                writer.writerow([
-                    'ID', 'Nombre Real', 'Nombre Lógico', 'URL Documentación',
-                    'KB SYNC', 'Fecha Homologación', 'Versiones Previas', 
-                    'Repositorio', 'Detalles', 'Creado Por', 'Creado', 'Actualizado'
-                ])
-                
-                # Escribir datos
-                for row in self.table_widget.record_data:
-                    writer.writerow([
-                        row['id'], 
-                        row['real_name'], 
-                        row.get('logical_name', ''),
-                        row.get('kb_url', ''),
-                        'Sí' if row.get('kb_sync') else 'No',
-                        row.get('homologation_date', ''),
-                        'Sí' if row.get('has_previous_versions') else 'No',
-                        row.get('repository_location', ''),
-                        row.get('details', '').replace('\n', ' ').replace('\r', ''),
-                        row.get('created_by_username', ''),
-                        row.get('created_at', ''),
-                        row.get('updated_at', '')
-                    ])
-                    
-            self.status_bar.showMessage(f"Datos exportados a {filename}", 5000)
-            
-        except Exception as e:
-            logger.error(f"Error exportando datos: {e}")
-            QMessageBox.critical(self, "Error", f"Error exportando datos: {str(e)}")
+        
+        if self.export_worker and self.export_worker.isRunning():
+            QMessageBox.warning(self, "Advertencia", "Ya hay una exportación en curso")
+            return
+        
+        # Copia de los registros para que el worker no dependa de la tabla
+        records = list(self.table_widget.record_data)
+        
+        self.status_bar.showMessage("Exportando datos...")
+        self.export_worker = ExportWorker(
+            lambda path, progress_cb: write_records_csv(records, path, progress_cb),
+            filename
+        )
+        self.export_worker.progress.connect(self.on_export_progress)
+        self.export_worker.export_done.connect(self.on_export_done)
+        self.export_worker.error.connect(self.on_export_error)
+        self.export_worker.start()
+    
+    def on_export_progress(self, count):
+        """Muestra el avance de la exportación."""
+        self.status_bar.showMessage(f"Exportando datos... {count} registros")
+    
+    def on_export_done(self, filename, count):
+        """Maneja la finalización de la exportación."""
+        self.status_bar.showMessage(f"Datos exportados a {filename} ({count} registros)", 5000)
+    
+    def on_export_error(self, error_message):
+        """Maneja errores de exportación."""
+        self.status_bar.showMessage("Error exportando datos")
+        QMessageBox.critical(self, "Error", f"Error exportando datos: {error_message}")
     
     def show_about(self):
         """Muestra información sobre la aplicación."""
@@ -1391,6 +1446,13 @@ class MainWindow(QMainWindow):
             self.data_worker.terminate()
             self.data_worker.wait()
         
+        # La exportación se deja terminar para no dejar archivos a medias
+        if self.export_worker and self.export_worker.isRunning():
+            self.export_worker.wait()
+        
+        # Cerrar la conexión del dashboard cuando no haya un refresco en curso
+        self.dashboard_widget.shutdown()
+        
         event.accept()
 
 